@@ -234,21 +234,35 @@ function App() {
       const response = await axios.post(`${API_URL}/api/export`, {
         project: currentProject,
         format: format
-      });
+      }, { responseType: 'blob' });
       
       toast.dismiss(loadingToast);
       
-      const downloadUrl = `${API_URL}${response.data.download_url}`;
+      // The server streams the ZIP archive directly in the response
+      const disposition = response.headers['content-disposition'] || '';
+      const filenameMatch = disposition.match(/filename="?([^"]+)"?/);
+      const filename = filenameMatch ? filenameMatch[1] : 'project_export.zip';
+      const downloadUrl = URL.createObjectURL(response.data);
       const link = document.createElement('a');
       link.href = downloadUrl;
-      link.download = response.data.filename;
+      link.download = filename;
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
+      URL.revokeObjectURL(downloadUrl);
       
-      toast.success(`Export completed! ${response.data.files_exported} files exported.`);
+      toast.success(`Export completed! ${response.headers['x-files-exported']} files exported.`);
     } catch (error) {
-      toast.error('Export failed: ' + (error.response?.data?.detail || error.message));
+      // Error bodies arrive as a Blob because of responseType: 'blob'
+      let detail = error.message;
+      if (error.response?.data instanceof Blob) {
+        try {
+          detail = JSON.parse(await error.response.data.text()).detail || detail;
+        } catch (parseError) {
+          // Keep the generic message
+        }
+      }
+      toast.error('Export failed: ' + detail);
       console.error(error);
     }
   };
@@ -0,0 +1,108 @@
+# server/api/cache.py
+import asyncio
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import orjson
+from pydantic import BaseModel
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Caching is optional; endpoints work without it
+    aioredis = None
+
+T = TypeVar("T")
+
+
+class ResponseCache:
+    """Redis-backed cache for responses of deterministic endpoints.
+
+    Entries are keyed on the endpoint name plus a hash of the validated
+    request body, so a repeated request skips model inference and audio
+    rendering entirely. When Redis is unavailable the cache is disabled and
+    every lookup is a miss.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, prefix: str = "amp",
+                 expire: int = 3600):
+        self.redis_url = redis_url or os.getenv("REDIS_URL")
+        self.prefix = prefix
+        self.expire = expire
+        self._redis: Optional[Any] = None
+
+    async def connect(self) -> None:
+        """Connect to Redis, leaving the cache disabled on failure"""
+        if not self.redis_url or aioredis is None:
+            return
+        try:
+            self._redis = aioredis.from_url(self.redis_url)
+            await self._redis.ping()
+            print(f"✅ Response cache connected: {self.redis_url}")
+        except Exception as e:
+            print(f"⚠️ Response cache disabled: {str(e)}")
+            self._redis = None
+
+    async def close(self) -> None:
+        """Close the Redis connection"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def key(self, endpoint: str, request: BaseModel) -> str:
+        """Build the cache key for an endpoint and its request body"""
+        digest = hashlib.sha1(request.model_dump_json().encode()).hexdigest()
+        return f"{self.prefix}:{endpoint}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Return the cached response for key, or None on a miss"""
+        if self._redis is None:
+            return None
+        try:
+            value = await self._redis.get(key)
+        except Exception as e:
+            print(f"⚠️ Cache read failed: {str(e)}")
+            return None
+        return orjson.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Dict) -> None:
+        """Store a response under key"""
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(
+                key, orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY), ex=self.expire
+            )
+        except Exception as e:
+            print(f"⚠️ Cache write failed: {str(e)}")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the work as a detached task; every
+    caller, the first included, awaits that task instead of repeating
+    inference and rendering. This covers the window before a result reaches
+    ResponseCache. Because the task is not owned by any one request, a client
+    disconnecting cancels only its own wait, not the work the others share.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def run(self, key: str, work: Callable[[], Awaitable[T]]) -> T:
+        """Run work for key, or wait for the identical call already running"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # Shield so a cancelled caller doesn't cancel the shared task
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished task and mark its exception as retrieved"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,244 @@
+# server/api/responses.py
+import io
+import os
+import re
+import zipfile
+from email.utils import parsedate
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+# Audio and video gain next to nothing from DEFLATE; pack them uncompressed
+_STORED_EXTENSIONS = frozenset({".wav", ".mp3", ".mp4", ".flac", ".ogg", ".m4a"})
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into an inclusive (start, end).
+
+    Returns None when the header should be ignored (malformed or multi-range,
+    in which case the whole file is served) and raises ValueError when the
+    range cannot be satisfied for a file of ``size`` bytes.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes of the file
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse with byte-range support that lets the server send the file.
+
+    Single ``Range`` requests are answered with 206 Partial Content so media
+    elements can seek and downloads can resume without refetching the file,
+    and conditional requests matching the ETag/Last-Modified get a bodyless
+    304 so players re-requesting the same file don't reread it.
+    For full-file responses, when the server advertises the
+    ``http.response.pathsend`` extension (Granian, Hypercorn, ...) only the
+    path is handed over, so the bytes go file -> socket via sendfile(2)
+    instead of through a Python read loop. Other servers fall back to
+    Starlette's chunked streaming.
+    """
+
+    def __init__(self, *args: Any, cache_control: Optional[str] = None,
+                 **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.headers.setdefault("accept-ranges", "bytes")
+        if cache_control is not None:
+            self.headers["cache-control"] = cache_control
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if self.stat_result is None:
+            self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(self.stat_result)
+        size = self.stat_result.st_size
+        send_body = scope.get("method", "GET").upper() != "HEAD"
+
+        request_headers = Headers(scope=scope)
+        if self._not_modified(request_headers):
+            headers = [(k, v) for k, v in self.raw_headers
+                       if k in (b"etag", b"last-modified", b"cache-control")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        range_header = request_headers.get("range")
+        byte_range = None
+        if range_header is not None:
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                await send({
+                    "type": "http.response.start",
+                    "status": 416,
+                    "headers": [
+                        (b"content-range", f"bytes */{size}".encode()),
+                        (b"content-length", b"0"),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+        if byte_range is not None:
+            await self._send_range(send, byte_range, size, send_body)
+        elif "http.response.pathsend" in scope.get("extensions", {}):
+            await self._send_path(send, send_body)
+        else:
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.background is not None:
+            await self.background()
+
+    def _not_modified(self, request_headers: Headers) -> bool:
+        """Whether the client's cached copy is still current"""
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            etag = self.headers.get("etag")
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return etag is not None and (etag in tags or "*" in tags)
+
+        if_modified_since = request_headers.get("if-modified-since")
+        last_modified = self.headers.get("last-modified")
+        if if_modified_since is None or last_modified is None:
+            return False
+        since, modified = parsedate(if_modified_since), parsedate(last_modified)
+        return since is not None and modified is not None and since >= modified
+
+    async def _send_path(self, send: Any, send_body: bool) -> None:
+        """Hand the whole file to the server via ``http.response.pathsend``"""
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if send_body:
+            await send({
+                "type": "http.response.pathsend",
+                "path": os.path.abspath(self.path),
+            })
+        else:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_range(self, send: Any, byte_range: Tuple[int, int],
+                          size: int, send_body: bool) -> None:
+        """Stream only the requested byte slice as 206 Partial Content"""
+        start, end = byte_range
+        length = end - start + 1
+
+        headers = [(k, v) for k, v in self.raw_headers if k != b"content-length"]
+        headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        headers.append((b"content-length", str(length).encode()))
+        await send({"type": "http.response.start", "status": 206, "headers": headers})
+
+        if not send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = length
+            more_body = True
+            while more_body:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = bool(chunk) and remaining > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+def accel_redirect(location: str, media_type: str,
+                   filename: Optional[str] = None) -> Response:
+    """Empty response telling nginx to send the file at an internal location.
+
+    The proxy serves the bytes itself (sendfile, Range, caching), so the
+    worker does constant work per request regardless of file size.
+    """
+    headers = {"X-Accel-Redirect": quote(location)}
+    if filename is not None:
+        quoted = quote(filename)
+        if quoted != filename:
+            headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return Response(headers=headers, media_type=media_type)
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable buffer that collects ZIP output between yields"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, str]],
+               on_close: Optional[Callable[[], None]] = None,
+               chunk_size: int = 64 * 1024,
+               compresslevel: int = 1) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``(path, arcname)`` pairs chunk by chunk.
+
+    The archive is never materialized: zipfile writes data descriptors when
+    the output is unseekable, so bytes can be sent as soon as each chunk is
+    compressed. ``on_close`` runs once the archive is finished or abandoned.
+
+    This is deliberately a sync generator: Starlette iterates it in the
+    threadpool, keeping file reads and deflate off the event loop. Media
+    files are stored as-is; everything else (MIDI, JSON, ...) is deflated.
+    """
+    sink = _ZipSink()
+    try:
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED,
+                             compresslevel=compresslevel) as zipf:
+            for path, arcname in files:
+                # ZipFile.open(name) takes the archive-wide compression setting
+                ext = os.path.splitext(arcname)[1].lower()
+                zipf.compression = (zipfile.ZIP_STORED if ext in _STORED_EXTENSIONS
+                                    else zipfile.ZIP_DEFLATED)
+                with open(path, "rb") as src, zipf.open(arcname, "w") as dst:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+        yield sink.drain()
+    finally:
+        if on_close is not None:
+            on_close()
@@ -0,0 +1,101 @@
+# server/api/storage.py
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import orjson
+
+TEMP_MAX_BYTES = int(os.getenv("TEMP_MAX_BYTES", str(2 * 1024 ** 3)))
+TEMP_MAX_AGE_HOURS = float(os.getenv("TEMP_MAX_AGE_HOURS", "24"))
+TEMP_EVICT_INTERVAL = int(os.getenv("TEMP_EVICT_INTERVAL", "300"))
+
+def evict_temp_files(directory: str, max_bytes: int = TEMP_MAX_BYTES,
+                     max_age_hours: float = TEMP_MAX_AGE_HOURS) -> int:
+    """Delete least recently used files that are expired or over the size budget"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            st = entry.stat()
+            # relatime mounts only update atime lazily, so take the newer of the two
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, entry.path))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+
+    for last_used, size, path in entries:
+        if total <= max_bytes and last_used >= cutoff:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    return removed
+
+async def run_temp_evictor(directory: str, interval: int = TEMP_EVICT_INTERVAL) -> None:
+    """Periodically evict old files from the generated-output directory"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(evict_temp_files, directory)
+            if removed:
+                print(f"🧹 Evicted {removed} files from {directory}")
+        except Exception as e:
+            print(f"⚠️ Temp eviction failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+ANALYSIS_INDEX = "_index.jsonl"
+
+def append_analysis_index(directory: str, file_id: str, analysis: Dict) -> None:
+    """Record a stored analysis in the directory's JSON-lines index"""
+    record = orjson.dumps({"file_id": file_id, "analysis": analysis},
+                          option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    with open(os.path.join(directory, ANALYSIS_INDEX), "ab") as f:
+        f.write(record)
+
+def read_analysis_index(directory: str) -> List[Dict]:
+    """Return every indexed analysis, keeping the latest record per file_id"""
+    analyses = {}
+    try:
+        with open(os.path.join(directory, ANALYSIS_INDEX), "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                    analyses[record["file_id"]] = record["analysis"]
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    # A torn append or partial write shouldn't hide the rest
+                    continue
+    except FileNotFoundError:
+        pass
+    return list(analyses.values())
+
+def rebuild_analysis_index(directory: str) -> None:
+    """Create the index from the per-file analyses if it doesn't exist yet"""
+    index_path = os.path.join(directory, ANALYSIS_INDEX)
+    if os.path.exists(index_path):
+        return
+
+    suffix = "_analysis.json"
+    # Every worker rebuilds at startup, so each writes its own temp file
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(suffix):
+                    with open(os.path.join(directory, filename), "rb") as f:
+                        analysis = orjson.loads(f.read())
+                    record = {"file_id": filename[:-len(suffix)], "analysis": analysis}
+                    out.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
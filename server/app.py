@@ -1,18 +1,29 @@
 # server/app.py
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import os
+import re
 import shutil
-from typing import List, Dict, Optional
+from pathlib import PurePosixPath
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 from pydantic import BaseModel
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-import zipfile
 import tempfile
-import json
+import orjson
+import copy
+from functools import lru_cache
+
+# librosa's numba kernels are compiled with cache=True; keep the compiled
+# objects in one place (mount it as a volume) so restarts skip the JIT.
+# Must be set before anything imports numba.
+os.environ.setdefault("NUMBA_CACHE_DIR", "./.numba_cache")
+os.makedirs(os.environ["NUMBA_CACHE_DIR"], exist_ok=True)
 
 # Import our AI modules
 from models.beat_generator import BeatGenerator
@@ -23,8 +34,37 @@ from audio.processor import AudioProcessor
 from audio.analyzer import MusicAnalyzer
 from audio.combiner import AudioCombiner
 from audio.mp4_exporter import MP4Exporter
+from api.responses import MediaFileResponse, accel_redirect, stream_zip
+from api.database import connect_database, close_database
+from api.cache import ResponseCache, SingleFlight
+from api.storage import (run_temp_evictor, append_analysis_index,
+                         read_analysis_index, rebuild_analysis_index)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect shared resources at startup and release them on shutdown"""
+    app.state.db = await connect_database()
+    await response_cache.connect()
+    await asyncio.to_thread(rebuild_analysis_index, "./data/analyzed")
+    evictor = asyncio.create_task(run_temp_evictor("./temp"))
+    # Compile librosa's numba kernels in the background, not on the first upload
+    warmup = asyncio.create_task(asyncio.to_thread(_warm_up_analyzer))
+    analysis_workers = [
+        asyncio.create_task(_analysis_worker()) for _ in range(ANALYSIS_WORKERS)
+    ]
+    yield
+    evictor.cancel()
+    warmup.cancel()
+    for worker in analysis_workers:
+        worker.cancel()
+    await response_cache.close()
+    await close_database()
 
-app = FastAPI(title="AI Music Producer API")
+app = FastAPI(
+    title="AI Music Producer API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -33,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "X-Files-Exported"],
 )
 
 # Create necessary directories
@@ -44,15 +85,64 @@ os.makedirs("./data/generated", exist_ok=True)
 os.makedirs("./data/songs", exist_ok=True)
 os.makedirs("./data/videos", exist_ok=True)
 
-# Initialize AI models
-beat_gen = BeatGenerator()
-melody_gen = MelodyGenerator()
-harmony_suggest = HarmonySuggester()
-song_gen = WholeSongGenerator()
-audio_proc = AudioProcessor()
-music_analyzer = MusicAnalyzer()
-audio_combiner = AudioCombiner()
-mp4_exporter = MP4Exporter()
+# AI models are built on first use (once per process) so importing the app
+# stays cheap for the reloader, tests and tooling
+@lru_cache(maxsize=1)
+def get_beat_gen() -> BeatGenerator:
+    return BeatGenerator()
+
+@lru_cache(maxsize=1)
+def get_melody_gen() -> MelodyGenerator:
+    return MelodyGenerator()
+
+@lru_cache(maxsize=1)
+def get_harmony_suggest() -> HarmonySuggester:
+    return HarmonySuggester()
+
+@lru_cache(maxsize=1)
+def get_song_gen() -> WholeSongGenerator:
+    # Share the generators above instead of loading a second set of models
+    return WholeSongGenerator(
+        beat_gen=get_beat_gen(),
+        melody_gen=get_melody_gen(),
+        harmony_suggest=get_harmony_suggest()
+    )
+
+@lru_cache(maxsize=1)
+def get_audio_proc() -> AudioProcessor:
+    return AudioProcessor()
+
+@lru_cache(maxsize=1)
+def get_music_analyzer() -> MusicAnalyzer:
+    return MusicAnalyzer(cache_dir=os.getenv("ANALYSIS_CACHE_DIR", "./data/analysis_cache"))
+
+@lru_cache(maxsize=1)
+def get_audio_combiner() -> AudioCombiner:
+    return AudioCombiner(track_cache_size=int(os.getenv("COMBINER_TRACK_CACHE", "4")))
+
+@lru_cache(maxsize=1)
+def get_mp4_exporter() -> MP4Exporter:
+    return MP4Exporter()
+
+def _warm_up_analyzer() -> None:
+    """Build the analyzer and trigger its JIT compilation (run in a thread)"""
+    try:
+        get_music_analyzer().warm_up()
+    except Exception as e:
+        print(f"⚠️ Analyzer warm-up failed: {str(e)}")
+
+# Under `gunicorn --preload` build the models in the master process so the
+# forked workers share them copy-on-write instead of each loading their own
+if os.getenv("PRELOAD_MODELS"):
+    for factory in (get_beat_gen, get_melody_gen, get_harmony_suggest, get_song_gen,
+                    get_audio_proc, get_music_analyzer, get_audio_combiner, get_mp4_exporter):
+        factory()
+
+# Stored JSON stays human-readable; numpy scalars from librosa serialize as-is
+JSON_FILE_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+response_cache = ResponseCache()
+inflight = SingleFlight()
 
 # Request/Response Models
 class BeatRequest(BaseModel):
@@ -61,6 +151,7 @@ class BeatRequest(BaseModel):
     bars: int = 4
     complexity: float = 0.7
     reference_file: Optional[str] = None
+    seed: Optional[int] = None
 
 class MelodyRequest(BaseModel):
     key: str = "C"
@@ -69,6 +160,7 @@ class MelodyRequest(BaseModel):
     bars: int = 4
     chord_progression: Optional[List[str]] = None
     reference_file: Optional[str] = None
+    seed: Optional[int] = None
 
 class HarmonyRequest(BaseModel):
     key: str = "C"
@@ -83,6 +175,7 @@ class SongRequest(BaseModel):
     duration: int = 180
     variations: int = 1
     title: Optional[str] = None
+    seed: Optional[int] = None
 
 class MP4ExportRequest(BaseModel):
     audio_file: str
@@ -110,6 +203,80 @@ class AudioAnalysisResponse(BaseModel):
     chord_progression: List[str]
     file_id: str
 
+# Helpers
+def _safe_path(directory: str, filename: str) -> str:
+    """Join a client-supplied filename onto directory without path traversal"""
+    # Keep only the final component, treating both separators as directory breaks
+    name = PurePosixPath(filename.replace("\\", "/")).name
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=404, detail="File not found")
+    return os.path.join(directory, name)
+
+async def _is_file(path: str) -> bool:
+    """Check for a regular file without blocking the event loop"""
+    return await asyncio.to_thread(os.path.isfile, path)
+
+# Internal nginx location prefix; when set, file downloads are handed to the
+# proxy via X-Accel-Redirect instead of being streamed through Python
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "").rstrip("/")
+
+# Beats are named after a hash of their content, so a URL never changes
+# meaning and browsers can keep it for a while. Other outputs are only
+# timestamped and may be overwritten, so clients revalidate with the ETag
+MEDIA_CACHE_CONTROL = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=86400")
+MUTABLE_MEDIA_CACHE_CONTROL = "no-cache"
+_CONTENT_ADDRESSED = re.compile(r"beat_[0-9a-f]{32}\.wav")
+
+def _file_response(file_path: str, location: str, media_type: str,
+                   filename: Optional[str] = None):
+    """Serve a file directly or through the proxy's internal location"""
+    if ACCEL_REDIRECT_PREFIX:
+        name = os.path.basename(file_path)
+        return accel_redirect(
+            f"{ACCEL_REDIRECT_PREFIX}/{location}/{name}", media_type, filename
+        )
+    if _CONTENT_ADDRESSED.fullmatch(os.path.basename(file_path)):
+        cache_control = MEDIA_CACHE_CONTROL
+    else:
+        cache_control = MUTABLE_MEDIA_CACHE_CONTROL
+    return MediaFileResponse(file_path, media_type=media_type, filename=filename,
+                             cache_control=cache_control)
+
+def _media_files(payload) -> List[str]:
+    """Collect the ./temp files referenced by *_url fields of a response"""
+    files = []
+    if isinstance(payload, dict):
+        for key, value in payload.items():
+            if key.endswith("_url") and isinstance(value, str) and value.startswith(("/api/audio/", "/api/midi/")):
+                files.append(_safe_path("./temp", value))
+            else:
+                files.extend(_media_files(value))
+    elif isinstance(payload, list):
+        for item in payload:
+            files.extend(_media_files(item))
+    return files
+
+async def _cached_response(cache_key: Optional[str]) -> Optional[Dict]:
+    """Return a cached response if every media file it points at still exists"""
+    if cache_key is None:
+        return None
+    cached = await response_cache.get(cache_key)
+    if cached is None:
+        return None
+    for path in _media_files(cached):
+        if not await _is_file(path):
+            return None
+    return cached
+
+# Model inference and synthesis are CPU-bound; run them in worker threads,
+# bounded so concurrent requests don't oversubscribe the CPU
+render_slots = asyncio.Semaphore(os.cpu_count() or 1)
+
+async def _render(func, *args, **kwargs):
+    """Run a blocking render function in a worker thread"""
+    async with render_slots:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -130,8 +297,8 @@ async def upload_music(file: UploadFile = File(...)):
         file_id = f"{timestamp}_{file.filename.replace(' ', '_')}"
         file_path = os.path.join("./data/uploads", file_id)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Copy off the event loop so large uploads don't stall other requests
+        await asyncio.to_thread(_save_upload, file.file, file_path)
         
         # Analyze the file
         analysis = await analyze_uploaded_music(file_path, file_id)
@@ -145,16 +312,91 @@ async def upload_music(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Larger copy buffer means far fewer read/write syscalls for big audio files
+UPLOAD_CHUNK_SIZE = 80 * 1024
+
+def _save_upload(src, file_path: str) -> None:
+    """Copy an uploaded file object to disk (blocking, run in a thread)"""
+    with open(file_path, "wb") as buffer:
+        # Starlette spools uploads over 1 MB into an on-disk TemporaryFile
+        # (SpooledTemporaryFile._rolled); copy those inside the kernel
+        rolled = isinstance(src, tempfile.SpooledTemporaryFile) and getattr(src, "_rolled", False)
+        if rolled and hasattr(os, "copy_file_range"):
+            try:
+                _copy_file_range(src, buffer)
+                return
+            except OSError:
+                buffer.seek(0)
+                buffer.truncate()
+        shutil.copyfileobj(src, buffer, length=UPLOAD_CHUNK_SIZE)
+
+def _copy_file_range(src, dst) -> None:
+    """Copy src to dst with copy_file_range(2), never entering user space"""
+    src.flush()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    offset = src.tell()
+    while True:
+        copied = os.copy_file_range(src_fd, dst_fd, 1 << 30, offset_src=offset)
+        if copied == 0:
+            break
+        offset += copied
+
+# Uploads are analyzed by a few background workers that each take up to
+# ANALYSIS_BATCH_SIZE queued files at a time, spread over ANALYSIS_JOBS
+# processes (1 analyzes in the worker thread itself)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "4"))
+ANALYSIS_JOBS = int(os.getenv("ANALYSIS_JOBS", "1"))
+analysis_queue: asyncio.Queue = asyncio.Queue()
+
+async def _analysis_worker() -> None:
+    """Drain the analysis queue in batches, resolving each caller's future"""
+    while True:
+        batch = [await analysis_queue.get()]
+        while len(batch) < ANALYSIS_BATCH_SIZE and not analysis_queue.empty():
+            batch.append(analysis_queue.get_nowait())
+        
+        # Skip files whose uploader has already gone away
+        batch = [(path, future) for path, future in batch if not future.done()]
+        if not batch:
+            continue
+        
+        try:
+            # librosa is CPU-bound; keep it off the event loop
+            results = await asyncio.to_thread(
+                get_music_analyzer().analyze_batch, [path for path, _ in batch],
+                n_jobs=ANALYSIS_JOBS
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        
+        for (_, future), analysis in zip(batch, results):
+            if not future.done():
+                future.set_result(analysis)
+
+def _write_json(path: str, data: Dict) -> None:
+    """Write a JSON result file (blocking, run in a thread)"""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=JSON_FILE_OPTIONS))
+
+def _save_analysis(file_id: str, analysis: Dict) -> None:
+    """Write an analysis file and index it (blocking, run in a thread)"""
+    _write_json(os.path.join("./data/analyzed", f"{file_id}_analysis.json"), analysis)
+    append_analysis_index("./data/analyzed", file_id, analysis)
+
 async def analyze_uploaded_music(file_path: str, file_id: str) -> Dict:
     """Analyze uploaded music file"""
     try:
-        # Perform deep analysis
-        analysis = music_analyzer.analyze_deep(file_path)
+        # Queue for deep analysis and wait for a worker to pick it up
+        future = asyncio.get_running_loop().create_future()
+        await analysis_queue.put((file_path, future))
+        analysis = await future
         
-        # Save analysis results
-        analysis_path = os.path.join("./data/analyzed", f"{file_id}_analysis.json")
-        with open(analysis_path, "w") as f:
-            json.dump(analysis, f, indent=2)
+        # Save analysis results (file I/O off the event loop)
+        await asyncio.to_thread(_save_analysis, file_id, analysis)
         
         analysis["file_id"] = file_id
         return analysis
@@ -167,140 +409,212 @@ async def analyze_uploaded_music(file_path: str, file_id: str) -> Dict:
 async def get_analyzed_files():
     """Get list of analyzed music files"""
     try:
-        analyzed_files = []
-        analysis_dir = "./data/analyzed"
-        
-        if os.path.exists(analysis_dir):
-            for filename in os.listdir(analysis_dir):
-                if filename.endswith("_analysis.json"):
-                    with open(os.path.join(analysis_dir, filename), "r") as f:
-                        analysis = json.load(f)
-                        analyzed_files.append(analysis)
+        # One read of the index instead of opening every analysis file
+        analyzed_files = await asyncio.to_thread(read_analysis_index, "./data/analyzed")
         
         return {"files": analyzed_files}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@lru_cache(maxsize=256)
+def _read_analysis(analysis_path: str, mtime_ns: int) -> Dict:
+    """Parse an analysis file; the mtime key drops entries for rewritten files"""
+    with open(analysis_path, "rb") as f:
+        return orjson.loads(f.read())
+
+def load_analysis(file_id: str) -> Dict:
+    """Read a stored analysis (raises FileNotFoundError if there is none)"""
+    analysis_path = os.path.join("./data/analyzed", f"{file_id}_analysis.json")
+    return _read_analysis(analysis_path, os.stat(analysis_path).st_mtime_ns)
+
+def _reference_analysis(file_id: str) -> Optional[Dict]:
+    """Return a private copy of a stored analysis or None (blocking, run in a thread)"""
+    try:
+        return copy.deepcopy(load_analysis(file_id))
+    except FileNotFoundError:
+        return None
+
+async def _beat_response(request: BeatRequest, cache_key: Optional[str],
+                         beat_gen: BeatGenerator, audio_proc: AudioProcessor) -> Dict:
+    """Generate a beat, render it and build the response payload"""
+    # Check if reference file is provided
+    reference_analysis = None
+    if request.reference_file:
+        reference_analysis = await asyncio.to_thread(_reference_analysis, request.reference_file)
+        if reference_analysis is not None:
+            # Override parameters with reference
+            request.tempo = int(reference_analysis.get("tempo", request.tempo))
+            request.genre = reference_analysis.get("genre", request.genre)
+    
+    # Generate beat pattern
+    pattern = await _render(
+        beat_gen.generate,
+        genre=request.genre,
+        tempo=request.tempo,
+        bars=request.bars,
+        complexity=request.complexity,
+        reference=reference_analysis,
+        seed=request.seed
+    )
+    
+    # Convert to audio
+    audio_path = await _render(
+        audio_proc.pattern_to_audio,
+        pattern, 
+        tempo=request.tempo,
+        output_dir="./temp"
+    )
+    
+    response = {
+        # orjson writes the array straight to JSON (OPT_SERIALIZE_NUMPY),
+        # without first boxing every cell into a Python float
+        "pattern": np.ascontiguousarray(pattern),
+        "audio_url": f"/api/audio/{os.path.basename(audio_path)}",
+        "tempo": request.tempo,
+        "genre": request.genre
+    }
+    if cache_key is not None:
+        await response_cache.set(cache_key, response)
+    
+    return response
+
 @app.post("/api/generate/beat")
-async def generate_beat(request: BeatRequest):
+async def generate_beat(request: BeatRequest,
+                        beat_gen: BeatGenerator = Depends(get_beat_gen),
+                        audio_proc: AudioProcessor = Depends(get_audio_proc)):
     """Generate a drum beat pattern"""
     try:
-        # Check if reference file is provided
-        reference_analysis = None
-        if request.reference_file:
-            analysis_path = os.path.join("./data/analyzed", f"{request.reference_file}_analysis.json")
-            if os.path.exists(analysis_path):
-                with open(analysis_path, "r") as f:
-                    reference_analysis = json.load(f)
-                    # Override parameters with reference
-                    request.tempo = int(reference_analysis.get("tempo", request.tempo))
-                    request.genre = reference_analysis.get("genre", request.genre)
-        
-        # Generate beat pattern
-        pattern = beat_gen.generate(
-            genre=request.genre,
-            tempo=request.tempo,
-            bars=request.bars,
-            complexity=request.complexity,
-            reference=reference_analysis
-        )
-        
-        # Convert to audio
-        audio_path = audio_proc.pattern_to_audio(
-            pattern, 
-            tempo=request.tempo,
-            output_dir="./temp"
-        )
+        # Seeded requests are deterministic, so their responses can be cached
+        cache_key = response_cache.key("beat", request) if request.seed is not None else None
+        cached = await _cached_response(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+        
+        # Identical concurrent seeded requests share a single generation;
+        # unseeded ones are meant to differ, so each runs on its own
+        if cache_key is None:
+            response = await _beat_response(request, cache_key, beat_gen, audio_proc)
+        else:
+            response = await inflight.run(
+                cache_key, lambda: _beat_response(request, cache_key, beat_gen, audio_proc)
+            )
         
-        return {
-            "pattern": pattern.tolist(),
-            "audio_url": f"/api/audio/{os.path.basename(audio_path)}",
-            "tempo": request.tempo,
-            "genre": request.genre
-        }
+        # Return directly: jsonable_encoder would turn the pattern array into
+        # nested lists; ORJSONResponse serializes numpy arrays natively
+        return ORJSONResponse(response)
         
     except Exception as e:
         print(f"Beat generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _melody_response(request: MelodyRequest, cache_key: Optional[str],
+                           melody_gen: MelodyGenerator, audio_proc: AudioProcessor) -> Dict:
+    """Generate a melody, render it and build the response payload"""
+    # Check if reference file is provided
+    reference_analysis = None
+    if request.reference_file:
+        reference_analysis = await asyncio.to_thread(_reference_analysis, request.reference_file)
+        if reference_analysis is not None:
+            # Override parameters with reference
+            request.key = reference_analysis.get("key", request.key)
+            request.tempo = int(reference_analysis.get("tempo", request.tempo))
+            if not request.chord_progression and "chord_progression" in reference_analysis:
+                request.chord_progression = reference_analysis["chord_progression"]
+    
+    # Generate melody
+    melody_data = await _render(
+        melody_gen.generate,
+        key=request.key,
+        scale=request.scale,
+        tempo=request.tempo,
+        bars=request.bars,
+        chord_progression=request.chord_progression,
+        reference=reference_analysis,
+        seed=request.seed
+    )
+    
+    # Convert to MIDI
+    midi_path = await _render(
+        audio_proc.melody_to_midi,
+        melody_data,
+        tempo=request.tempo,
+        output_dir="./temp"
+    )
+    
+    # Also create audio preview
+    audio_path = await _render(audio_proc.midi_to_audio, midi_path)
+    
+    # Store generated file info
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    generated_info = {
+        "type": "melody",
+        "midi_file": os.path.basename(midi_path),
+        "audio_file": os.path.basename(audio_path),
+        "data": melody_data,
+        "timestamp": timestamp
+    }
+    
+    info_path = os.path.join("./data/generated", f"melody_{timestamp}.json")
+    await asyncio.to_thread(_write_json, info_path, generated_info)
+    
+    response = {
+        "notes": melody_data["notes"],
+        "durations": melody_data["durations"],
+        "key": melody_data["key"],
+        "scale": melody_data["scale"],
+        "midi_url": f"/api/midi/{os.path.basename(midi_path)}",
+        "audio_url": f"/api/audio/{os.path.basename(audio_path)}",
+        "file_id": f"melody_{timestamp}"
+    }
+    if cache_key is not None:
+        await response_cache.set(cache_key, response)
+    
+    return response
+
 @app.post("/api/generate/melody")
-async def generate_melody(request: MelodyRequest):
+async def generate_melody(request: MelodyRequest,
+                          melody_gen: MelodyGenerator = Depends(get_melody_gen),
+                          audio_proc: AudioProcessor = Depends(get_audio_proc)):
     """Generate a melody based on parameters"""
     try:
-        # Check if reference file is provided
-        reference_analysis = None
-        if request.reference_file:
-            analysis_path = os.path.join("./data/analyzed", f"{request.reference_file}_analysis.json")
-            if os.path.exists(analysis_path):
-                with open(analysis_path, "r") as f:
-                    reference_analysis = json.load(f)
-                    # Override parameters with reference
-                    request.key = reference_analysis.get("key", request.key)
-                    request.tempo = int(reference_analysis.get("tempo", request.tempo))
-                    if not request.chord_progression and "chord_progression" in reference_analysis:
-                        request.chord_progression = reference_analysis["chord_progression"]
-        
-        # Generate melody
-        melody_data = melody_gen.generate(
-            key=request.key,
-            scale=request.scale,
-            tempo=request.tempo,
-            bars=request.bars,
-            chord_progression=request.chord_progression,
-            reference=reference_analysis
-        )
-        
-        # Convert to MIDI
-        midi_path = audio_proc.melody_to_midi(
-            melody_data,
-            tempo=request.tempo,
-            output_dir="./temp"
-        )
-        
-        # Also create audio preview
-        audio_path = audio_proc.midi_to_audio(midi_path)
-        
-        # Store generated file info
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        generated_info = {
-            "type": "melody",
-            "midi_file": os.path.basename(midi_path),
-            "audio_file": os.path.basename(audio_path),
-            "data": melody_data,
-            "timestamp": timestamp
-        }
-        
-        info_path = os.path.join("./data/generated", f"melody_{timestamp}.json")
-        with open(info_path, "w") as f:
-            json.dump(generated_info, f, indent=2)
+        # Seeded requests are deterministic, so their responses can be cached
+        cache_key = response_cache.key("melody", request) if request.seed is not None else None
+        cached = await _cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent seeded requests share a single generation;
+        # unseeded ones are meant to differ, so each runs on its own
+        if cache_key is None:
+            response = await _melody_response(request, cache_key, melody_gen, audio_proc)
+        else:
+            response = await inflight.run(
+                cache_key, lambda: _melody_response(request, cache_key, melody_gen, audio_proc)
+            )
         
-        return {
-            "notes": melody_data["notes"],
-            "durations": melody_data["durations"],
-            "key": melody_data["key"],
-            "scale": melody_data["scale"],
-            "midi_url": f"/api/midi/{os.path.basename(midi_path)}",
-            "audio_url": f"/api/audio/{os.path.basename(audio_path)}",
-            "file_id": f"melody_{timestamp}"
-        }
+        return response
         
     except Exception as e:
         print(f"Melody generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/generate/whole-song")
-async def generate_whole_song(request: SongRequest):
+async def generate_whole_song(request: SongRequest,
+                              song_gen: WholeSongGenerator = Depends(get_song_gen),
+                              audio_proc: AudioProcessor = Depends(get_audio_proc)):
     """Generate a complete song with multiple sections"""
     try:
         print(f"🎵 Starting whole song generation: {request.style}")
         
         # Generate main song
-        song_data = song_gen.generate_whole_song(
+        song_data = await _render(
+            song_gen.generate_whole_song,
             style=request.style,
             tempo=request.tempo,
             key=request.key,
-            total_duration=request.duration
+            total_duration=request.duration,
+            seed=request.seed
         )
         
         # Generate title if not provided
@@ -312,25 +626,31 @@ async def generate_whole_song(request: SongRequest):
         # Generate variations if requested
         variations = []
         if request.variations > 1:
-            variations = song_gen.generate_arrangement_variations(
+            variations = await _render(
+                song_gen.generate_arrangement_variations,
                 song_data, 
-                num_variations=request.variations - 1
+                num_variations=request.variations - 1,
+                # Offset so variations don't replay the main song's draws
+                seed=None if request.seed is None else request.seed + 1
             )
         
-        # Convert song sections to audio
-        audio_path = audio_proc.song_to_audio(
-            song_data,
-            output_dir="./temp"
+        # Render the song and its variations concurrently; each is independent
+        audio_path, *var_audio_paths = await asyncio.gather(
+            _render(audio_proc.song_to_audio, song_data, output_dir="./temp"),
+            *(
+                _render(
+                    audio_proc.song_to_audio,
+                    variation,
+                    output_dir="./temp",
+                    suffix=f"_var{i+1}"
+                )
+                for i, variation in enumerate(variations)
+            )
         )
         
         # Process variations
         variation_data = []
-        for i, variation in enumerate(variations):
-            var_audio_path = audio_proc.song_to_audio(
-                variation,
-                output_dir="./temp",
-                suffix=f"_var{i+1}"
-            )
+        for variation, var_audio_path in zip(variations, var_audio_paths):
             variation_data.append({
                 "variation_id": variation["variation_id"],
                 "style": variation["style"],
@@ -350,8 +670,7 @@ async def generate_whole_song(request: SongRequest):
         }
         
         song_path = os.path.join("./data/songs", f"{song_id}.json")
-        with open(song_path, "w") as f:
-            json.dump(song_info, f, indent=2)
+        await asyncio.to_thread(_write_json, song_path, song_info)
         
         return {
             "title": request.title,
@@ -372,14 +691,15 @@ async def generate_whole_song(request: SongRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/export/mp4")
-async def export_mp4(request: MP4ExportRequest):
+async def export_mp4(request: MP4ExportRequest,
+                     mp4_exporter: MP4Exporter = Depends(get_mp4_exporter)):
     """Export song as MP4 video with visualization"""
     try:
         print(f"🎬 Starting MP4 export: {request.visual_style}")
         
         # Find audio file
-        audio_path = os.path.join("./temp", request.audio_file)
-        if not os.path.exists(audio_path):
+        audio_path = _safe_path("./temp", request.audio_file)
+        if not await _is_file(audio_path):
             raise HTTPException(status_code=404, detail="Audio file not found")
         
         # Generate MP4
@@ -388,7 +708,8 @@ async def export_mp4(request: MP4ExportRequest):
         mp4_path = os.path.join("./data/videos", mp4_filename)
         
         # Create music video
-        final_mp4_path = mp4_exporter.create_music_video(
+        final_mp4_path = await _render(
+            mp4_exporter.create_music_video,
             audio_path=audio_path,
             song_data=request.song_data,
             output_path=mp4_path,
@@ -407,18 +728,20 @@ async def export_mp4(request: MP4ExportRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/combine/tracks")
-async def combine_tracks(request: CombineRequest):
+async def combine_tracks(request: CombineRequest,
+                         audio_combiner: AudioCombiner = Depends(get_audio_combiner)):
     """Combine beat and melody tracks"""
     try:
         # Get file paths
-        beat_path = os.path.join("./temp", request.beat_file)
-        melody_path = os.path.join("./temp", request.melody_file)
+        beat_path = _safe_path("./temp", request.beat_file)
+        melody_path = _safe_path("./temp", request.melody_file)
         
-        if not os.path.exists(beat_path) or not os.path.exists(melody_path):
+        if not await _is_file(beat_path) or not await _is_file(melody_path):
             raise HTTPException(status_code=404, detail="Track files not found")
         
         # Combine audio
-        output_path = audio_combiner.combine(
+        output_path = await _render(
+            audio_combiner.combine,
             beat_path=beat_path,
             melody_path=melody_path,
             tempo=request.tempo,
@@ -435,166 +758,217 @@ async def combine_tracks(request: CombineRequest):
         print(f"Combination error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _harmony_response(request: HarmonyRequest, cache_key: Optional[str],
+                            harmony_suggest: HarmonySuggester,
+                            audio_proc: AudioProcessor) -> Dict:
+    """Suggest progressions, render previews and build the response payload"""
+    progressions = await _render(
+        harmony_suggest.suggest,
+        key=request.key,
+        genre=request.genre,
+        mood=request.mood,
+        bars=request.bars
+    )
+    
+    # Generate audio previews for top 3 progressions
+    previews = []
+    for i, prog in enumerate(progressions[:3]):
+        audio_path = await _render(
+            audio_proc.chords_to_audio,
+            prog["chords"],
+            tempo=120,
+            output_dir="./temp"
+        )
+        previews.append({
+            "progression": prog,
+            "audio_url": f"/api/audio/{os.path.basename(audio_path)}"
+        })
+    
+    response = {"suggestions": previews}
+    await response_cache.set(cache_key, response)
+    
+    return response
+
 @app.post("/api/suggest/harmony")
-async def suggest_harmony(request: HarmonyRequest):
+async def suggest_harmony(request: HarmonyRequest,
+                          harmony_suggest: HarmonySuggester = Depends(get_harmony_suggest),
+                          audio_proc: AudioProcessor = Depends(get_audio_proc)):
     """Suggest chord progressions"""
     try:
-        progressions = harmony_suggest.suggest(
-            key=request.key,
-            genre=request.genre,
-            mood=request.mood,
-            bars=request.bars
+        # Suggestions are a pure function of the request
+        cache_key = response_cache.key("harmony", request)
+        cached = await _cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent requests share a single generation
+        response = await inflight.run(
+            cache_key, lambda: _harmony_response(request, cache_key, harmony_suggest, audio_proc)
         )
         
-        # Generate audio previews for top 3 progressions
-        previews = []
-        for i, prog in enumerate(progressions[:3]):
-            audio_path = audio_proc.chords_to_audio(
-                prog["chords"],
-                tempo=120,
-                output_dir="./temp"
-            )
-            previews.append({
-                "progression": prog,
-                "audio_url": f"/api/audio/{os.path.basename(audio_path)}"
-            })
-        
-        return {"suggestions": previews}
+        return response
         
     except Exception as e:
         print(f"Harmony suggestion error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _existing_files(files: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Keep the (path, name) pairs whose file exists (blocking, run in a thread)"""
+    return [(path, name) for path, name in files if os.path.exists(path)]
+
+def _render_melody(audio_proc: AudioProcessor, melody: Dict, output_dir: str,
+                   output_filename: str, with_audio: bool) -> List[str]:
+    """Render one melody to MIDI (and optionally WAV) inside output_dir"""
+    midi_path = audio_proc.melody_to_midi(
+        melody,
+        tempo=melody.get("tempo", 120),
+        output_dir=output_dir,
+        output_filename=output_filename
+    )
+    paths = [midi_path]
+    if with_audio:
+        paths.append(audio_proc.midi_to_audio(midi_path))
+    return paths
+
 @app.post("/api/export")
-async def export_project(request: ExportRequest):
-    """Export project to audio/MIDI files"""
+async def export_project(request: ExportRequest,
+                         audio_proc: AudioProcessor = Depends(get_audio_proc)):
+    """Export project to audio/MIDI files, streamed back as a ZIP archive"""
+    # Rendered files live here until the archive has been streamed
+    temp_dir = tempfile.mkdtemp(prefix="export_")
     try:
         project = request.project
         export_format = request.format
         
-        # Create temporary directory for export files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            export_files = []
-            
-            # Export beats
-            if project.get("beats"):
-                for i, beat in enumerate(project["beats"]):
-                    if "pattern" in beat:
-                        pattern = np.array(beat["pattern"])
-                        audio_path = audio_proc.pattern_to_audio(
-                            pattern,
-                            tempo=beat.get("tempo", 120),
-                            output_dir=temp_dir
-                        )
-                        beat_name = f"beat_{i+1}_{beat.get('genre', 'unknown')}.wav"
-                        beat_path = os.path.join(temp_dir, beat_name)
-                        os.rename(audio_path, beat_path)
-                        export_files.append(beat_path)
-            
-            # Export melodies
-            if project.get("melodies"):
-                for i, melody in enumerate(project["melodies"]):
-                    if "notes" in melody and "durations" in melody:
-                        # Export as MIDI
-                        midi_path = audio_proc.melody_to_midi(
-                            melody,
-                            tempo=melody.get("tempo", 120),
-                            output_dir=temp_dir
-                        )
-                        melody_name = f"melody_{i+1}.mid"
-                        melody_midi_path = os.path.join(temp_dir, melody_name)
-                        os.rename(midi_path, melody_midi_path)
-                        export_files.append(melody_midi_path)
-                        
-                        # Also export as audio
-                        if export_format in ["wav", "both"]:
-                            audio_path = audio_proc.midi_to_audio(melody_midi_path)
-                            audio_name = f"melody_{i+1}.wav"
-                            melody_audio_path = os.path.join(temp_dir, audio_name)
-                            os.rename(audio_path, melody_audio_path)
-                            export_files.append(melody_audio_path)
-            
-            # Export songs
-            if project.get("songs"):
-                for i, song in enumerate(project["songs"]):
-                    if "audio_url" in song:
-                        src_filename = song["audio_url"].split("/")[-1]
-                        src_path = os.path.join("./temp", src_filename)
-                        if os.path.exists(src_path):
-                            dst_name = f"song_{i+1}_{song.get('title', 'untitled')}.wav"
-                            dst_path = os.path.join(temp_dir, dst_name)
-                            shutil.copy(src_path, dst_path)
-                            export_files.append(dst_path)
-            
-            # Export combined tracks if available
-            if project.get("combined_tracks"):
-                for i, track in enumerate(project["combined_tracks"]):
-                    if "file" in track:
-                        src_path = os.path.join("./temp", track["file"])
-                        if os.path.exists(src_path):
-                            dst_name = f"combined_{i+1}.wav"
-                            dst_path = os.path.join(temp_dir, dst_name)
-                            shutil.copy(src_path, dst_path)
-                            export_files.append(dst_path)
-            
-            if not export_files:
-                raise HTTPException(status_code=400, detail="No exportable content found")
-            
-            # Create ZIP file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            project_name = project.get("name", "Untitled_Project").replace(" ", "_")
-            zip_filename = f"{project_name}_{timestamp}.zip"
-            zip_path = os.path.join("./temp", zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in export_files:
-                    zipf.write(file_path, os.path.basename(file_path))
+        # (source path, name inside the archive)
+        export_files = []
+        
+        # Songs and combined tracks are streamed straight from ./temp (no
+        # copy needed) when they still exist
+        stored_files = []
+        
+        # Export songs
+        if project.get("songs"):
+            for i, song in enumerate(project["songs"]):
+                if "audio_url" in song:
+                    src_filename = song["audio_url"].split("/")[-1]
+                    src_path = _safe_path("./temp", src_filename)
+                    dst_name = f"song_{i+1}_{song.get('title', 'untitled')}.wav"
+                    stored_files.append((src_path, dst_name))
+        
+        # Export combined tracks if available
+        if project.get("combined_tracks"):
+            for i, track in enumerate(project["combined_tracks"]):
+                if "file" in track:
+                    src_path = _safe_path("./temp", track["file"])
+                    stored_files.append((src_path, f"combined_{i+1}.wav"))
+        
+        # Render beats and melodies concurrently; each render is independent
+        renders = []
+        render_names = []
+        
+        # Export beats
+        if project.get("beats"):
+            for i, beat in enumerate(project["beats"]):
+                if "pattern" in beat:
+                    pattern = np.asarray(beat["pattern"], dtype=np.float64)
+                    renders.append(_render(
+                        audio_proc.pattern_to_audio,
+                        pattern,
+                        tempo=beat.get("tempo", 120),
+                        output_dir=temp_dir,
+                        output_filename=f"beat_{i+1}.wav"
+                    ))
+                    render_names.append([f"beat_{i+1}_{beat.get('genre', 'unknown')}.wav"])
+        
+        # Export melodies as MIDI, plus audio when requested
+        if project.get("melodies"):
+            with_audio = export_format in ["wav", "both"]
+            for i, melody in enumerate(project["melodies"]):
+                if "notes" in melody and "durations" in melody:
+                    # Final names up front, so nothing is renamed after rendering
+                    renders.append(_render(
+                        _render_melody,
+                        audio_proc,
+                        melody,
+                        temp_dir,
+                        f"melody_{i+1}.mid",
+                        with_audio
+                    ))
+                    names = [f"melody_{i+1}.mid"]
+                    if with_audio:
+                        names.append(f"melody_{i+1}.wav")
+                    render_names.append(names)
+        
+        # The existence checks run in a worker thread alongside the renders
+        *rendered, existing = await asyncio.gather(
+            *renders, asyncio.to_thread(_existing_files, stored_files)
+        )
+        for paths, names in zip(rendered, render_names):
+            if isinstance(paths, str):
+                paths = [paths]
+            export_files.extend(zip(paths, names))
+        export_files.extend(existing)
         
-        return {
-            "download_url": f"/api/download/{zip_filename}",
-            "filename": zip_filename,
-            "files_exported": len(export_files)
-        }
+        if not export_files:
+            raise HTTPException(status_code=400, detail="No exportable content found")
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/download/{filename}")
-async def download_export(filename: str):
-    """Download exported project files"""
-    file_path = f"./temp/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(
-            file_path, 
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        project_name = project.get("name", "Untitled_Project").replace(" ", "_")
+        zip_filename = f"{project_name}_{timestamp}.zip"
+        
+        # The generator cleans up once iterated; the background task also
+        # covers clients that disconnect before the body starts
+        cleanup = lambda: shutil.rmtree(temp_dir, ignore_errors=True)
+        return StreamingResponse(
+            stream_zip(export_files, on_close=cleanup),
             media_type="application/zip",
-            filename=filename
+            headers={
+                "Content-Disposition": f'attachment; filename="{zip_filename}"',
+                "X-Files-Exported": str(len(export_files))
+            },
+            background=BackgroundTask(cleanup)
         )
-    raise HTTPException(status_code=404, detail="Export file not found")
+        
+    except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/audio/{filename}")
 async def get_audio(filename: str):
     """Serve audio files"""
-    file_path = f"./temp/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="audio/wav")
+    file_path = _safe_path("./temp", filename)
+    if await _is_file(file_path):
+        return _file_response(file_path, "temp", "audio/wav")
     raise HTTPException(status_code=404, detail="Audio file not found")
 
 @app.get("/api/midi/{filename}")
 async def get_midi(filename: str):
     """Serve MIDI files"""
-    file_path = f"./temp/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="audio/midi")
+    file_path = _safe_path("./temp", filename)
+    if await _is_file(file_path):
+        return _file_response(file_path, "temp", "audio/midi")
     raise HTTPException(status_code=404, detail="MIDI file not found")
 
 @app.get("/api/video/{filename}")
 async def get_video(filename: str):
     """Serve MP4 video files"""
-    file_path = f"./data/videos/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="video/mp4")
+    file_path = _safe_path("./data/videos", filename)
+    if await _is_file(file_path):
+        return _file_response(file_path, "videos", "video/mp4")
     raise HTTPException(status_code=404, detail="Video file not found")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # "auto" picks uvloop/httptools when installed (they aren't on Windows)
+    if os.getenv("DEV"):
+        # The reloader watches the filesystem and only supports one worker
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True,
+                    loop="auto", http="auto")
+    else:
+        workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers,
+                    loop="auto", http="auto")
\ No newline at end of file
@@ -1,41 +1,152 @@
 # server/audio/analyzer.py
 import librosa
 import numpy as np
-from typing import Dict, List
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
 import soundfile as sf
+import orjson
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_limits
+from .analyzer_kernels import key_and_correlations
+
+# Pitch-class names in chroma bin order
+_NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# Common progressions by key (every key currently maps to the pop default)
+_DEFAULT_PROGRESSION = ("I", "V", "vi", "IV")
+_PROGRESSIONS = {
+    key: _DEFAULT_PROGRESSION
+    for key in ("C", "G", "D", "A", "E", "B", "F#", "F", "Bb", "Eb", "Ab", "Db")
+}
+
+# Analyzer reused by each joblib worker process across batches
+_worker_analyzer: Optional["MusicAnalyzer"] = None
+
+def _analyze_in_worker(file_path: str, cache_dir: Optional[str],
+                       max_duration: Optional[float]) -> Dict:
+    """Analyze one file in a worker process, limited to a single BLAS thread"""
+    global _worker_analyzer
+    if (_worker_analyzer is None or _worker_analyzer.cache_dir != cache_dir
+            or _worker_analyzer.max_duration != max_duration):
+        _worker_analyzer = MusicAnalyzer(cache_dir=cache_dir, max_duration=max_duration)
+    with threadpool_limits(1):
+        return _worker_analyzer.analyze_deep(file_path)
 
 class MusicAnalyzer:
-    def __init__(self):
+    def __init__(self, cache_size: int = 128, cache_dir: Optional[str] = None,
+                 max_duration: Optional[float] = 60.0):
         self.sample_rate = 22050
+        # Features summarize a window from the middle of the track (None
+        # analyzes all of it); the reported duration covers the whole file
+        self.max_duration = max_duration
         
-    def analyze_deep(self, file_path: str) -> Dict:
+        # Analyses keyed by file content hash, most recently used last
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Optional on-disk copy of the same cache, shared across restarts
+        # and worker processes
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        
+    def warm_up(self) -> None:
+        """Run the feature pipeline on a short signal so numba kernels compile now"""
+        
+        y = np.random.default_rng(0).uniform(-0.1, 0.1, self.sample_rate).astype(np.float32)
+        librosa.beat.beat_track(y=y, sr=self.sample_rate)
+        S = np.abs(librosa.stft(y))
+        librosa.feature.spectral_centroid(S=S, sr=self.sample_rate)
+        chroma = librosa.feature.chroma_stft(S=S ** 2, sr=self.sample_rate)
+        key_and_correlations(chroma)
+    
+    def analyze_batch(self, file_paths: List[str], n_jobs: int = 1) -> List[Dict]:
+        """Analyze several files, in n_jobs worker processes when n_jobs != 1"""
+        
+        if n_jobs != 1 and len(file_paths) > 1:
+            # One BLAS thread per process, so workers don't oversubscribe cores
+            return Parallel(n_jobs=n_jobs, backend="loky")(
+                delayed(_analyze_in_worker)(path, self.cache_dir, self.max_duration)
+                for path in file_paths
+            )
+        
+        # Back to back in this process, sharing one STFT buffer sized for the
+        # longest audio analyze_deep will decode (unbounded without a window)
+        stft_out = None
+        if self.max_duration is not None:
+            n_fft, hop_length = 2048, 512
+            max_samples = int(np.ceil(self.max_duration * self.sample_rate))
+            stft_out = np.empty((1 + n_fft // 2, 2 + max_samples // hop_length),
+                                dtype=np.complex64)
+        
+        return [self.analyze_deep(path, stft_out=stft_out) for path in file_paths]
+    
+    def analyze_deep(self, file_path: str,
+                     stft_out: Optional[np.ndarray] = None) -> Dict:
         """Perform deep analysis of uploaded music file"""
         
         try:
             print(f"🔍 Analyzing music file: {file_path}")
             
-            # Load audio
-            y, sr = librosa.load(file_path, sr=self.sample_rate)
-            duration = len(y) / sr
+            # Re-uploads of the same audio skip the librosa pipeline
+            digest = self._file_digest(file_path)
+            with self._cache_lock:
+                cached = self._cache.get(digest)
+                if cached is not None:
+                    self._cache.move_to_end(digest)
+            if cached is None:
+                cached = self._load_cached(digest)
+                if cached is not None:
+                    self._remember(digest, cached)
+            if cached is not None:
+                print(f"♻️ Reusing cached analysis: {file_path}")
+                return copy.deepcopy(cached)
             
-            # Extract features
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+            # Load audio (only the centered analysis window is decoded)
+            duration = librosa.get_duration(path=file_path)
+            offset = 0.0
+            if self.max_duration is not None and duration > self.max_duration:
+                offset = (duration - self.max_duration) / 2
+            # Every feature here sits well below the resampler's passband edge,
+            # so the fast soxr setting is indistinguishable from the default
+            y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True,
+                                 offset=offset, duration=self.max_duration,
+                                 res_type="soxr_lq")
+            
+            # One STFT shared by every spectral feature below
+            S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512, out=stft_out))
+            S_power = np.square(S)
+            spectral_centroid = librosa.feature.spectral_centroid(S=S, sr=sr)
+            
+            # Extract features (the onset envelope is what beat_track would
+            # otherwise derive from a second STFT of its own)
+            mel = librosa.feature.melspectrogram(S=S_power, sr=sr)
+            onset_env = librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=sr)
+            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
             
             # Key detection (simplified)
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-            key = self._detect_key(chroma)
+            chroma = librosa.feature.chroma_stft(S=S_power, sr=sr)
+            key_idx, major_correlation, minor_correlation = key_and_correlations(chroma)
+            key = self._detect_key(key_idx)
             
             # Genre classification (simplified)
-            genre = self._classify_genre(y, sr)
+            genre = self._classify_genre(S, y, sr, spectral_centroid)
             
             # Time signature detection
-            time_signature = self._detect_time_signature(beats, tempo)
+            time_signature = self._detect_time_signature(onset_env, beats)
             
             # Energy analysis
             energy = self._calculate_energy(y)
             
             # Mood detection
-            mood = self._detect_mood(y, sr, energy)
+            mood = self._detect_mood(major_correlation, minor_correlation,
+                                     spectral_centroid, energy)
             
             # Chord progression (simplified)
             chord_progression = self._extract_chord_progression(chroma, key)
@@ -52,6 +163,9 @@ class MusicAnalyzer:
                 "chord_progression": chord_progression
             }
             
+            self._remember(digest, copy.deepcopy(analysis))
+            self._store_cached(digest, analysis)
+            
             print(f"✅ Analysis complete: {analysis}")
             return analysis
             
@@ -70,26 +184,65 @@ class MusicAnalyzer:
                 "chord_progression": ["I", "V", "vi", "IV"]
             }
     
-    def _detect_key(self, chroma: np.ndarray) -> str:
-        """Detect musical key from chroma features"""
+    def _file_digest(self, file_path: str) -> str:
+        """Hash the file contents in 1 MB chunks"""
         
-        # Average chroma across time
-        chroma_mean = np.mean(chroma, axis=1)
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    
+    def _remember(self, digest: str, analysis: Dict) -> None:
+        """Add an analysis to the in-memory LRU cache"""
+        
+        with self._cache_lock:
+            self._cache[digest] = analysis
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _cache_path(self, digest: str) -> str:
+        """On-disk cache file for a digest (the analysis settings are part of the name)"""
         
-        # Find dominant note
-        dominant_note_idx = np.argmax(chroma_mean)
+        window = "full" if self.max_duration is None else f"mid{int(self.max_duration)}"
+        return os.path.join(self.cache_dir, f"{digest}_{self.sample_rate}_{window}.json")
+    
+    def _load_cached(self, digest: str) -> Optional[Dict]:
+        """Read a stored analysis from the disk cache, if there is one"""
         
-        # Map to note names
-        note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_path(digest), "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+    
+    def _store_cached(self, digest: str, analysis: Dict) -> None:
+        """Write an analysis to the disk cache atomically"""
         
-        return note_names[dominant_note_idx]
+        if self.cache_dir is None:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(orjson.dumps(analysis, option=orjson.OPT_SERIALIZE_NUMPY))
+            os.replace(tmp_path, self._cache_path(digest))
+        except OSError as e:
+            print(f"⚠️ Analysis cache write failed: {str(e)}")
     
-    def _classify_genre(self, y: np.ndarray, sr: int) -> str:
+    def _detect_key(self, dominant_note_idx: int) -> str:
+        """Detect musical key from the dominant chroma bin"""
+        
+        return _NOTE_NAMES[dominant_note_idx]
+    
+    def _classify_genre(self, S: np.ndarray, y: np.ndarray, sr: int,
+                        spectral_centroid: np.ndarray) -> str:
         """Classify genre (simplified heuristic-based)"""
         
-        # Extract features
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
+        # Extract features from the shared magnitude spectrogram
+        spectral_rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)
         zero_crossing_rate = librosa.feature.zero_crossing_rate(y)
         
         # Calculate means
@@ -109,28 +262,32 @@ class MusicAnalyzer:
         else:
             return "pop"
     
-    def _detect_time_signature(self, beats: np.ndarray, tempo: float) -> str:
-        """Detect time signature"""
-        
-        # Simplified: analyze beat intervals
-        if len(beats) < 8:
-            return "4/4"
-        
-        # Calculate beat intervals
-        beat_intervals = np.diff(beats)
+    def _detect_time_signature(self, onset_env: np.ndarray, beats: np.ndarray) -> str:
+        """Detect time signature from the accent pattern of the tracked beats"""
         
-        # Look for patterns
-        if len(beat_intervals) > 0:
-            # Most music is 4/4
+        # Too few beats to see a bar-level period; most music is 4/4
+        if len(beats) < 12:
             return "4/4"
         
-        return "4/4"
+        # Downbeats are accented, so beat strengths repeat every bar: compare
+        # the autocorrelation at a 3-beat and a 4-beat lag
+        strengths = onset_env[beats]
+        ac = librosa.autocorrelate(strengths - strengths.mean(), max_size=5)
+        return "3/4" if ac[3] > max(ac[4], 0) else "4/4"
     
     def _calculate_energy(self, y: np.ndarray) -> float:
         """Calculate overall energy level"""
         
-        # RMS energy
-        rms_energy = librosa.feature.rms(y=y)
+        # Frame-wise RMS as librosa.feature.rms(y=y) computes it (centered,
+        # zero-padded 2048-sample frames, hop 512), but from a running sum of
+        # squares instead of a (2048 x frames) temporary
+        frame_length, hop_length = 2048, 512
+        padded = np.pad(y, frame_length // 2)
+        n_frames = 1 + (len(padded) - frame_length) // hop_length
+        cumsum = np.concatenate(([0.0], np.cumsum(np.square(padded, dtype=np.float64))))
+        starts = np.arange(n_frames) * hop_length
+        frame_power = (cumsum[starts + frame_length] - cumsum[starts]) / frame_length
+        rms_energy = np.sqrt(np.maximum(frame_power, 0.0))
         energy_mean = np.mean(rms_energy)
         
         # Normalize to 0-1 range
@@ -138,20 +295,11 @@ class MusicAnalyzer:
         
         return float(energy_normalized)
     
-    def _detect_mood(self, y: np.ndarray, sr: int, energy: float) -> str:
+    def _detect_mood(self, major_correlation: float, minor_correlation: float,
+                     spectral_centroid: np.ndarray, energy: float) -> str:
         """Detect mood from audio features"""
         
-        # Extract spectral features
-        spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        
-        # Major/minor detection (simplified)
-        chroma_mean = np.mean(chroma, axis=1)
-        major_profile = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1])
-        minor_profile = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0])
-        
-        major_correlation = np.corrcoef(chroma_mean, major_profile)[0, 1]
-        minor_correlation = np.corrcoef(chroma_mean, minor_profile)[0, 1]
+        spectral_centroid = np.mean(spectral_centroid)
         
         # Determine mood
         if energy > 0.7 and major_correlation > minor_correlation:
@@ -173,21 +321,5 @@ class MusicAnalyzer:
         # Simplified chord progression extraction
         # This is a very basic implementation
         
-        # Common progressions by key
-        progressions = {
-            "C": ["I", "V", "vi", "IV"],
-            "G": ["I", "V", "vi", "IV"], 
-            "D": ["I", "V", "vi", "IV"],
-            "A": ["I", "V", "vi", "IV"],
-            "E": ["I", "V", "vi", "IV"],
-            "B": ["I", "V", "vi", "IV"],
-            "F#": ["I", "V", "vi", "IV"],
-            "F": ["I", "V", "vi", "IV"],
-            "Bb": ["I", "V", "vi", "IV"],
-            "Eb": ["I", "V", "vi", "IV"],
-            "Ab": ["I", "V", "vi", "IV"],
-            "Db": ["I", "V", "vi", "IV"]
-        }
-        
         # Return progression for key, or default
-        return progressions.get(key, ["I", "V", "vi", "IV"])
\ No newline at end of file
+        return list(_PROGRESSIONS.get(key, _DEFAULT_PROGRESSION))
\ No newline at end of file
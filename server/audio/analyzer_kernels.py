@@ -0,0 +1,27 @@
+# server/audio/analyzer_kernels.py
+import numba
+import numpy as np
+
+# Pitch-class templates for the major/minor estimate, starting at C
+MAJOR_PROFILE = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1], dtype=np.float64)
+MINOR_PROFILE = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0], dtype=np.float64)
+
+def _normalize_rows(profiles: np.ndarray) -> np.ndarray:
+    """Center each row and scale it to unit length"""
+    centered = profiles - profiles.mean(axis=1, keepdims=True)
+    return centered / np.linalg.norm(centered, axis=1, keepdims=True)
+
+# Pre-normalized, so a Pearson correlation against every profile is one matvec
+MODE_PROFILES = _normalize_rows(np.stack([MAJOR_PROFILE, MINOR_PROFILE]))
+
+# cache=True keeps the compiled kernel on disk across restarts
+@numba.njit(cache=True)
+def key_and_correlations(chroma: np.ndarray):
+    """Return the dominant pitch class and major/minor profile correlations"""
+    means = np.empty(chroma.shape[0])
+    for i in range(chroma.shape[0]):
+        means[i] = chroma[i].mean()
+    centered = means - means.mean()
+    # The epsilon turns silence (a flat chroma) into 0 instead of NaN
+    correlations = MODE_PROFILES @ centered / (np.sqrt(np.dot(centered, centered)) + 1e-12)
+    return np.argmax(means), correlations[0], correlations[1]
@@ -1,13 +1,46 @@
 # server/audio/combiner.py
 import numpy as np
 import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+from scipy.signal import resample_poly
 from typing import Dict
 import os
 from datetime import datetime
+import numba
+
+try:
+    import soxr
+except ImportError:  # soxr ships with librosa; scipy's polyphase filter is the fallback
+    soxr = None
+
+# The kernels fuse each array expression into one loop, without the
+# temporaries numpy allocates for track * level and abs(). Not
+# parallel=True: they are called from concurrent render threads and numba's
+# default threading layer aborts on concurrent use; nogil lets renders overlap
+@numba.njit(cache=True, nogil=True, fastmath=True)
+def _mix_into(mixed: np.ndarray, track: np.ndarray, level: float) -> None:
+    """Accumulate track * level into mixed in place"""
+    mixed += track * level
+
+@numba.njit(cache=True, nogil=True, fastmath=True)
+def _scale_to_peak(audio: np.ndarray, target_peak: float) -> None:
+    """Scale audio in place so its absolute peak equals target_peak"""
+    if audio.size == 0:
+        return
+    peak = np.abs(audio).max()
+    if peak > 0:
+        audio *= target_peak / peak
 
 class AudioCombiner:
-    def __init__(self):
+    def __init__(self, track_cache_size: int = 4):
         self.sample_rate = 44100
+        
+        # Decoded stems keyed by (path, mtime), so remixing the same files
+        # with new levels skips decoding and resampling. A full-song stem is
+        # ~30 MB of float32 per worker, so keep only a few
+        self._decode_cached = lru_cache(maxsize=track_cache_size)(self._decode_track)
     
     def combine(self, beat_path: str, melody_path: str, tempo: int = 120,
                 mix_levels: Dict[str, float] = None, output_dir: str = "./temp") -> str:
@@ -19,46 +52,24 @@ class AudioCombiner:
         try:
             print(f"🎛️ Combining tracks: {beat_path} + {melody_path}")
             
-            # Load audio files
-            beat_audio, beat_sr = sf.read(beat_path)
-            melody_audio, melody_sr = sf.read(melody_path)
-            
-            # Resample if necessary
-            if beat_sr != self.sample_rate:
-                beat_audio = self._resample(beat_audio, beat_sr, self.sample_rate)
-            if melody_sr != self.sample_rate:
-                melody_audio = self._resample(melody_audio, melody_sr, self.sample_rate)
+            # Load audio files (decoding releases the GIL, so read both at once)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                beat_audio, melody_audio = pool.map(self._load_track, [beat_path, melody_path])
             
-            # Make mono if stereo
-            if beat_audio.ndim > 1:
-                beat_audio = np.mean(beat_audio, axis=1)
-            if melody_audio.ndim > 1:
-                melody_audio = np.mean(melody_audio, axis=1)
-            
-            # Match lengths (pad shorter track or trim longer track)
+            # Match lengths by looping the shorter track to the longer one
             max_length = max(len(beat_audio), len(melody_audio))
-            min_length = min(len(beat_audio), len(melody_audio))
-            
-            # Option 1: Loop shorter track to match longer one
             if len(beat_audio) < max_length:
                 beat_audio = self._loop_audio(beat_audio, max_length)
             if len(melody_audio) < max_length:
                 melody_audio = self._loop_audio(melody_audio, max_length)
             
-            # Option 2: Trim to shorter length (alternative approach)
-            # beat_audio = beat_audio[:min_length]
-            # melody_audio = melody_audio[:min_length]
-            
-            # Apply mix levels
-            beat_mixed = beat_audio * mix_levels.get("beat", 0.7)
-            melody_mixed = melody_audio * mix_levels.get("melody", 0.8)
-            
-            # Combine tracks
-            combined = beat_mixed + melody_mixed
+            # Apply mix levels and combine tracks into a single buffer
+            combined = np.zeros(max_length, dtype=np.float32)
+            _mix_into(combined, beat_audio, mix_levels.get("beat", 0.7))
+            _mix_into(combined, melody_audio, mix_levels.get("melody", 0.8))
             
             # Normalize to prevent clipping
-            if np.max(np.abs(combined)) > 0:
-                combined = combined / np.max(np.abs(combined)) * 0.9
+            _scale_to_peak(combined, 0.9)
             
             # Save combined track
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -74,21 +85,47 @@ class AudioCombiner:
             print(f"❌ Error combining tracks: {str(e)}")
             raise
     
+    def _load_track(self, path: str) -> np.ndarray:
+        """Read a track as mono float32 at the combiner's sample rate (cached)"""
+        
+        return self._decode_cached(path, os.stat(path).st_mtime_ns)
+    
+    def _decode_track(self, path: str, mtime_ns: int) -> np.ndarray:
+        """Decode, resample and downmix a track; the result is shared read-only"""
+        
+        audio, sr = sf.read(path, dtype="float32")
+        
+        # Resample if necessary
+        if sr != self.sample_rate:
+            audio = self._resample(audio, sr, self.sample_rate)
+        
+        # Make mono if stereo (channel sum into one buffer, then one scale)
+        if audio.ndim > 1:
+            mono = np.empty(audio.shape[0], dtype=np.float32)
+            if audio.shape[1] == 2:
+                np.add(audio[:, 0], audio[:, 1], out=mono)
+            else:
+                np.sum(audio, axis=1, out=mono)
+            mono *= 1.0 / audio.shape[1]
+            audio = mono
+        
+        audio.flags.writeable = False
+        return audio
+    
     def _resample(self, audio: np.ndarray, original_sr: int, target_sr: int) -> np.ndarray:
-        """Simple resampling (basic implementation)"""
+        """Polyphase resampling (anti-aliased, works on mono or multichannel)"""
         
         if original_sr == target_sr:
             return audio
         
-        # Calculate resampling ratio
-        ratio = target_sr / original_sr
-        new_length = int(len(audio) * ratio)
+        if soxr is not None:
+            # libsoxr's SIMD polyphase kernel, medium quality
+            return soxr.resample(audio, original_sr, target_sr, quality="MQ")
         
-        # Simple linear interpolation resampling
-        old_indices = np.linspace(0, len(audio) - 1, len(audio))
-        new_indices = np.linspace(0, len(audio) - 1, new_length)
+        # Reduce the rate ratio to small integers, e.g. 48000 -> 44100 is 147/160
+        ratio = Fraction(target_sr, original_sr).limit_denominator(1000)
         
-        resampled = np.interp(new_indices, old_indices, audio)
+        resampled = resample_poly(audio, ratio.numerator, ratio.denominator, axis=0)
         
         return resampled.astype(np.float32)
     
@@ -98,16 +135,12 @@ class AudioCombiner:
         if len(audio) >= target_length:
             return audio[:target_length]
         
-        # Calculate how many full loops we need
-        loops_needed = target_length // len(audio)
-        remainder = target_length % len(audio)
-        
-        # Create looped audio
-        looped = np.tile(audio, loops_needed)
-        
-        # Add partial loop if needed
-        if remainder > 0:
-            looped = np.concatenate([looped, audio[:remainder]])
+        # Fill a single preallocated buffer period by period (the last copy
+        # is the partial loop), instead of tiling and then concatenating
+        looped = np.empty(target_length, dtype=audio.dtype)
+        period = len(audio)
+        for start in range(0, target_length, period):
+            looped[start:start + period] = audio[:target_length - start]
         
         return looped
     
@@ -121,41 +154,27 @@ class AudioCombiner:
         try:
             print(f"🎛️ Mixing {len(track_paths)} tracks")
             
-            # Load all tracks
-            tracks = []
-            max_length = 0
-            
-            for path in track_paths:
-                if os.path.exists(path):
-                    audio, sr = sf.read(path)
-                    
-                    # Resample if necessary
-                    if sr != self.sample_rate:
-                        audio = self._resample(audio, sr, self.sample_rate)
-                    
-                    # Make mono
-                    if audio.ndim > 1:
-                        audio = np.mean(audio, axis=1)
-                    
-                    tracks.append(audio)
-                    max_length = max(max_length, len(audio))
-            
-            if not tracks:
+            # Load all tracks in parallel, keeping each one's level with it
+            found = [(path, level) for path, level in zip(track_paths, mix_levels)
+                     if os.path.exists(path)]
+            if not found:
                 raise ValueError("No valid tracks found")
             
-            # Pad all tracks to same length
-            for i in range(len(tracks)):
-                if len(tracks[i]) < max_length:
-                    tracks[i] = self._loop_audio(tracks[i], max_length)
+            with ThreadPoolExecutor(max_workers=min(8, len(found))) as pool:
+                loaded = pool.map(self._load_track, [path for path, _ in found])
+                tracks = [(audio, level) for audio, (_, level) in zip(loaded, found)]
+            max_length = max(len(audio) for audio, _ in tracks)
             
-            # Mix tracks
-            mixed = np.zeros(max_length)
-            for track, level in zip(tracks, mix_levels):
-                mixed += track * level
+            # Mix tracks into one preallocated buffer, looping shorter ones
+            # as they are added rather than storing padded copies
+            mixed = np.zeros(max_length, dtype=np.float32)
+            for track, level in tracks:
+                if len(track) < max_length:
+                    track = self._loop_audio(track, max_length)
+                _mix_into(mixed, track, level)
             
             # Normalize
-            if np.max(np.abs(mixed)) > 0:
-                mixed = mixed / np.max(np.abs(mixed)) * 0.9
+            _scale_to_peak(mixed, 0.9)
             
             # Save
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
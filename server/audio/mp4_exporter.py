@@ -2,19 +2,167 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
 import librosa
 import cv2
-import tempfile
 import os
-from typing import Dict, Optional
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
 import soundfile as sf
+from imageio_ffmpeg import get_ffmpeg_exe
+from joblib import Parallel, delayed
+from scipy.fft import rfft
+from scipy.signal import get_window
+import numba
+
+# One fused loop instead of a dozen small numpy calls and mask arrays per
+# frame; the Generator is shared, so segments replay the same stream
+@numba.njit(cache=True, nogil=True)
+def _step_particles(x: np.ndarray, y: np.ndarray, vx: np.ndarray, vy: np.ndarray,
+                    life: np.ndarray, energy: float, width: int, height: int,
+                    rng: np.random.Generator) -> None:
+    """Advance the particle arrays one frame in place"""
+    speed = 1 + energy * 5
+    for i in range(x.shape[0]):
+        x[i] += vx[i] * speed
+        y[i] += vy[i] * speed
+        life[i] -= 0.01
+        
+        # Respawn dead particles at a random position
+        if life[i] <= 0:
+            x[i] = rng.random() * width
+            y[i] = rng.random() * height
+            life[i] = 1.0
+        
+        # Wrap around screen edges
+        x[i] %= width
+        y[i] %= height
+
+class _FFmpegWriter:
+    """VideoWriter-style sink piping raw BGR frames into one ffmpeg process.
+    
+    ffmpeg encodes H.264 directly (muxing in the soundtrack when audio_path
+    is given), so the finished file needs no second transcode.
+    """
+    
+    def __init__(self, output_path: str, fps: int, resolution: Tuple[int, int],
+                 audio_path: Optional[str] = None):
+        width, height = resolution
+        cmd = [get_ffmpeg_exe(), "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+               "-r", str(fps), "-i", "-"]
+        if audio_path is not None:
+            cmd += ["-i", audio_path, "-c:a", "aac", "-shortest"]
+        cmd += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", output_path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    
+    def write(self, frame: np.ndarray) -> None:
+        """Send one contiguous BGR frame to the encoder"""
+        self._proc.stdin.write(frame.data)
+    
+    def release(self) -> None:
+        """Finish encoding, raising if ffmpeg failed"""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self._proc.returncode}")
+
+# Queued in place of a frame to re-send the previous one
+_REPEAT = object()
+
+class _FrameWriter:
+    """Feed a video writer from a background thread with pooled frame buffers.
+    
+    Drawing takes a cleared buffer from the pool with frame() and hands it
+    back through write(); the thread encodes it and returns it to the pool,
+    so encoding overlaps with drawing the next frames without per-frame
+    allocations. repeat() re-sends the last frame without drawing it again.
+    Closing (or leaving the with block) drains the queue and releases the
+    writer.
+    """
+    
+    def __init__(self, writer: _FFmpegWriter, shape: Tuple[int, int, int],
+                 pool_size: int = 8):
+        self._writer = writer
+        self._error: Optional[Exception] = None
+        self._free: "queue.Queue[np.ndarray]" = queue.Queue()
+        for _ in range(pool_size):
+            self._free.put(np.empty(shape, dtype=np.uint8))
+        self._pending: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def __enter__(self) -> "_FrameWriter":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def frame(self) -> np.ndarray:
+        """Take a cleared buffer to draw the next frame into"""
+        frame = self._free.get()
+        frame.fill(0)
+        return frame
+    
+    def write(self, frame: np.ndarray) -> None:
+        """Queue a drawn frame for encoding"""
+        self._pending.put(frame)
+    
+    def repeat(self) -> None:
+        """Queue the previously written frame once more"""
+        self._pending.put(_REPEAT)
+    
+    def close(self) -> None:
+        """Wait for queued frames to be encoded and release the writer"""
+        self._pending.put(None)
+        self._thread.join()
+        self._writer.release()
+        if self._error is not None:
+            raise self._error
+    
+    def _run(self) -> None:
+        # The last written buffer stays out of the pool so it can be repeated
+        last = None
+        while True:
+            frame = self._pending.get()
+            if frame is None:
+                if last is not None:
+                    self._free.put(last)
+                return
+            if frame is _REPEAT:
+                frame = last
+            # After a failure keep recycling buffers so drawing never blocks
+            if self._error is None:
+                try:
+                    self._writer.write(frame)
+                except Exception as e:
+                    self._error = e
+            if frame is not last:
+                if last is not None:
+                    self._free.put(last)
+                last = frame
 
 class MP4Exporter:
-    def __init__(self):
+    def __init__(self, render_jobs: Optional[int] = None):
         self.sample_rate = 44100
         self.fps = 30
         self.resolution = (1920, 1080)  # HD resolution
+        
+        # Longer videos are drawn as time segments in up to render_jobs
+        # processes, none shorter than min_segment_seconds
+        self.render_jobs = render_jobs or os.cpu_count() or 1
+        self.min_segment_seconds = 10
+        self.particle_seed = 0
+        
+        # Spectrum analyzer STFT settings (periodic Hann, as librosa uses)
+        self.n_fft = 2048
+        self.hop_length = 512
+        self._stft_window = get_window("hann", self.n_fft)
     
     def create_music_video(self, audio_path: str, song_data: Dict, 
                           output_path: str, style: str = "waveform") -> str:
@@ -24,150 +172,239 @@ class MP4Exporter:
         
         try:
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sample_rate)
-            duration = len(audio) / sr
+            audio = self._load_audio(audio_path)
+            duration = len(audio) / self.sample_rate
             
-            # Create temporary video file
-            with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_video:
-                temp_video_path = temp_video.name
+            # Generate video based on style, encoded together with the audio
+            self._render_video(style, audio, duration, output_path, song_data, audio_path)
             
-            # Generate video based on style
-            if style == "waveform":
-                self._create_waveform_video(audio, duration, temp_video_path, song_data)
-            elif style == "spectrum":
-                self._create_spectrum_video(audio_path, duration, temp_video_path, song_data)
-            elif style == "particles":
-                self._create_particle_video(audio, duration, temp_video_path, song_data)
-            else:
-                self._create_waveform_video(audio, duration, temp_video_path, song_data)
-            
-            # Combine video with audio
-            final_path = self._combine_audio_video(audio_path, temp_video_path, output_path)
-            
-            # Cleanup
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-            
-            print(f"✅ MP4 created: {final_path}")
-            return final_path
+            print(f"✅ MP4 created: {output_path}")
+            return output_path
             
         except Exception as e:
             print(f"❌ MP4 creation error: {str(e)}")
             raise
     
+    def _render_video(self, style: str, audio: np.ndarray, duration: float,
+                      output_path: str, song_data: Dict, audio_path: str):
+        """Render the visuals, splitting longer videos into parallel segments"""
+        
+        total_frames = int(duration * self.fps)
+        jobs = min(self.render_jobs, total_frames // (self.fps * self.min_segment_seconds))
+        if jobs <= 1:
+            self._render_frames(style, audio, duration, output_path, song_data,
+                                0, total_frames, audio_path)
+            return
+        
+        # Every frame depends only on the audio (particles replay their state
+        # up to the segment start), so segments join seamlessly
+        bounds = np.linspace(0, total_frames, jobs + 1).astype(int).tolist()
+        # Segments get fixed names in a private directory, away from the
+        # user-derived output name
+        part_dir = tempfile.mkdtemp(prefix="video_parts_")
+        part_paths = [os.path.join(part_dir, f"part{i}.mp4") for i in range(jobs)]
+        
+        try:
+            Parallel(n_jobs=jobs, backend="loky")(
+                delayed(self._render_frames)(style, audio, duration, path, song_data,
+                                             start, end)
+                for path, start, end in zip(part_paths, bounds[:-1], bounds[1:])
+            )
+            self._concat_videos(part_paths, output_path, audio_path)
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
+    
+    def _render_frames(self, style: str, audio: np.ndarray, duration: float,
+                       output_path: str, song_data: Dict,
+                       start_frame: int, end_frame: int,
+                       audio_path: Optional[str] = None):
+        """Render frames [start_frame, end_frame) of the given style to output_path"""
+        
+        if style == "spectrum":
+            self._create_spectrum_video(audio, duration, output_path, song_data,
+                                        start_frame, end_frame, audio_path)
+        elif style == "particles":
+            self._create_particle_video(audio, duration, output_path, song_data,
+                                        start_frame, end_frame, audio_path)
+        else:
+            self._create_waveform_video(audio, duration, output_path, song_data,
+                                        start_frame, end_frame, audio_path)
+    
+    def _concat_videos(self, part_paths: List[str], output_path: str, audio_path: str):
+        """Join video segments without re-encoding them and mux in the audio"""
+        
+        list_path = os.path.join(os.path.dirname(part_paths[0]), "parts.txt")
+        with open(list_path, "w") as f:
+            for path in part_paths:
+                # The concat demuxer reads quoted paths; escape embedded quotes
+                quoted = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{quoted}'\n")
+        
+        subprocess.run(
+            [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "concat",
+             "-safe", "0", "-i", list_path, "-i", audio_path,
+             "-c:v", "copy", "-c:a", "aac", "-shortest", output_path],
+            check=True
+        )
+    
+    def _load_audio(self, audio_path: str) -> np.ndarray:
+        """Read audio as mono float32, resampling only when the rate differs"""
+        
+        audio, sr = sf.read(audio_path, dtype="float32")
+        if audio.ndim > 1:
+            audio = np.mean(audio, axis=1)
+        if sr != self.sample_rate:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
+        return audio
+    
     def _create_waveform_video(self, audio: np.ndarray, duration: float, 
-                              output_path: str, song_data: Dict):
+                              output_path: str, song_data: Dict,
+                              start_frame: int = 0, end_frame: Optional[int] = None,
+                              audio_path: Optional[str] = None):
         """Create waveform visualization video"""
         
         # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, self.fps, self.resolution)
+        out = _FFmpegWriter(output_path, self.fps, self.resolution, audio_path)
         
         # Calculate frames
         total_frames = int(duration * self.fps)
+        end_frame = total_frames if end_frame is None else end_frame
         samples_per_frame = len(audio) // total_frames if total_frames > 0 else len(audio)
         
         # Colors based on style
         colors = self._get_style_colors(song_data.get("style", "pop"))
-        
-        for frame_idx in range(total_frames):
-            # Create frame
-            frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
-            
-            # Get audio segment for this frame
-            start_sample = frame_idx * samples_per_frame
-            end_sample = min(start_sample + samples_per_frame * 10, len(audio))  # Look ahead for smoother animation
-            
-            if start_sample < len(audio):
+        song_info = self._song_info_sprites(song_data)
+        
+        # Frames are encoded on a background thread while the next is drawn
+        with _FrameWriter(out, (self.resolution[1], self.resolution[0], 3)) as writer:
+            previous = None
+            for frame_idx in range(start_frame, end_frame):
+                # Get audio segment for this frame
+                start_sample = frame_idx * samples_per_frame
+                end_sample = min(start_sample + samples_per_frame * 10, len(audio))  # Look ahead for smoother animation
                 audio_segment = audio[start_sample:end_sample]
                 
-                # Draw waveform
-                self._draw_waveform(frame, audio_segment, colors, frame_idx, total_frames)
+                # Stretches of digital silence draw the same frame again
+                progress_width = self._progress_width(frame_idx, total_frames)
+                if (previous is not None and progress_width == previous[0]
+                        and np.array_equal(audio_segment, previous[1])):
+                    writer.repeat()
+                    continue
+                previous = (progress_width, audio_segment)
                 
-                # Add song info
-                self._draw_song_info(frame, song_data, frame_idx, total_frames)
-            
-            # Write frame
-            out.write(frame)
-        
-        out.release()
+                frame = writer.frame()
+                
+                if start_sample < len(audio):
+                    # Draw waveform
+                    self._draw_waveform(frame, audio_segment, colors, frame_idx, total_frames)
+                    
+                    # Add song info
+                    self._draw_song_info(frame, song_info, frame_idx, total_frames)
+                
+                # Write frame
+                writer.write(frame)
     
-    def _create_spectrum_video(self, audio_path: str, duration: float, 
-                              output_path: str, song_data: Dict):
+    def _create_spectrum_video(self, audio: np.ndarray, duration: float, 
+                              output_path: str, song_data: Dict,
+                              start_frame: int = 0, end_frame: Optional[int] = None,
+                              audio_path: Optional[str] = None):
         """Create spectrum analyzer visualization"""
         
-        # Load audio for spectral analysis
-        audio, sr = librosa.load(audio_path, sr=self.sample_rate)
-        
-        # Compute spectrograms
-        hop_length = 512
-        n_fft = 2048
-        stft = librosa.stft(audio, hop_length=hop_length, n_fft=n_fft)
-        magnitude = np.abs(stft)
-        
         # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, self.fps, self.resolution)
+        out = _FFmpegWriter(output_path, self.fps, self.resolution, audio_path)
         
         total_frames = int(duration * self.fps)
-        frames_per_stft = len(magnitude[0]) // total_frames if total_frames > 0 else 1
+        end_frame = total_frames if end_frame is None else end_frame
+        
+        # Centered STFT framing (as librosa.stft), but only the column each
+        # video frame shows is transformed
+        n_columns = 1 + len(audio) // self.hop_length
+        frames_per_stft = n_columns // total_frames if total_frames > 0 else 1
+        stft_idx = np.minimum(np.arange(start_frame, end_frame) * frames_per_stft,
+                              n_columns - 1)
+        padded = np.pad(audio, self.n_fft // 2)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)
+        segments = windows[stft_idx * self.hop_length] * self._stft_window
+        
+        # Spectral data for every video frame at once (multi-threaded FFT):
+        # only the bottom quarter of the spectrum (lower frequencies visualize
+        # better), each normalized to its own peak
+        n_bins = 1 + self.n_fft // 2
+        spectra = np.abs(rfft(segments, axis=-1, workers=-1)[:, :n_bins // 4])
+        peaks = spectra.max(axis=1, keepdims=True)
+        np.divide(spectra, peaks, out=spectra, where=peaks > 0)
         
         colors = self._get_style_colors(song_data.get("style", "pop"))
+        song_info = self._song_info_sprites(song_data)
         
-        for frame_idx in range(total_frames):
-            frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
-            
-            # Get spectral data for this frame
-            stft_idx = min(frame_idx * frames_per_stft, len(magnitude[0]) - 1)
-            spectrum = magnitude[:, stft_idx]
-            
-            # Draw spectrum analyzer
-            self._draw_spectrum(frame, spectrum, colors, frame_idx, total_frames)
-            
-            # Add song info
-            self._draw_song_info(frame, song_data, frame_idx, total_frames)
-            
-            out.write(frame)
-        
-        out.release()
+        # Frames are encoded on a background thread while the next is drawn
+        with _FrameWriter(out, (self.resolution[1], self.resolution[0], 3)) as writer:
+            previous = None
+            for frame_idx in range(start_frame, end_frame):
+                spectrum = spectra[frame_idx - start_frame]
+                
+                # Unchanged spectra (e.g. silence) draw the same frame again
+                progress_width = self._progress_width(frame_idx, total_frames)
+                if (previous is not None and progress_width == previous[0]
+                        and np.array_equal(spectrum, previous[1])):
+                    writer.repeat()
+                    continue
+                previous = (progress_width, spectrum)
+                
+                frame = writer.frame()
+                
+                # Draw spectrum analyzer
+                self._draw_spectrum(frame, spectrum, colors, frame_idx, total_frames)
+                
+                # Add song info
+                self._draw_song_info(frame, song_info, frame_idx, total_frames)
+                
+                writer.write(frame)
     
     def _create_particle_video(self, audio: np.ndarray, duration: float, 
-                              output_path: str, song_data: Dict):
+                              output_path: str, song_data: Dict,
+                              start_frame: int = 0, end_frame: Optional[int] = None,
+                              audio_path: Optional[str] = None):
         """Create particle system visualization"""
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, self.fps, self.resolution)
+        out = _FFmpegWriter(output_path, self.fps, self.resolution, audio_path)
         
-        # Initialize particles
+        # Initialize particles (seeded, so every segment sees the same system)
         num_particles = 100
-        particles = self._init_particles(num_particles)
+        rng = np.random.default_rng(self.particle_seed)
+        particles = self._init_particles(num_particles, rng)
         
         total_frames = int(duration * self.fps)
+        end_frame = total_frames if end_frame is None else end_frame
         samples_per_frame = len(audio) // total_frames if total_frames > 0 else len(audio)
         
         colors = self._get_style_colors(song_data.get("style", "pop"))
+        song_info = self._song_info_sprites(song_data)
         
-        for frame_idx in range(total_frames):
-            frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
-            
-            # Get audio energy for this frame
-            start_sample = frame_idx * samples_per_frame
-            end_sample = min(start_sample + samples_per_frame, len(audio))
-            
-            if start_sample < len(audio):
-                audio_segment = audio[start_sample:end_sample]
-                energy = np.mean(np.abs(audio_segment))
-                
-                # Update and draw particles
-                particles = self._update_particles(particles, energy)
-                self._draw_particles(frame, particles, colors, energy)
-            
-            # Add song info
-            self._draw_song_info(frame, song_data, frame_idx, total_frames)
-            
-            out.write(frame)
+        # Mean absolute level of every frame's audio segment in one reduction
+        energies = np.abs(audio[:total_frames * samples_per_frame]).reshape(
+            total_frames, samples_per_frame).mean(axis=1)
         
-        out.release()
+        # Replay the simulation up to this segment's first frame without drawing
+        for frame_idx in range(start_frame):
+            particles = self._update_particles(particles, energies[frame_idx], rng)
+        
+        # Frames are encoded on a background thread while the next is drawn
+        with _FrameWriter(out, (self.resolution[1], self.resolution[0], 3)) as writer:
+            for frame_idx in range(start_frame, end_frame):
+                frame = writer.frame()
+                
+                if frame_idx * samples_per_frame < len(audio):
+                    energy = energies[frame_idx]
+                    
+                    # Update and draw particles
+                    particles = self._update_particles(particles, energy, rng)
+                    self._draw_particles(frame, particles, colors, energy)
+                
+                # Add song info
+                self._draw_song_info(frame, song_info, frame_idx, total_frames)
+                
+                writer.write(frame)
     
     def _draw_waveform(self, frame: np.ndarray, audio: np.ndarray, 
                       colors: Dict, frame_idx: int, total_frames: int):
@@ -184,99 +421,120 @@ class MP4Exporter:
             audio_downsampled = np.pad(audio, (0, w - len(audio)), mode='constant')
         
         # Normalize and scale
-        if np.max(np.abs(audio_downsampled)) > 0:
-            audio_downsampled = audio_downsampled / np.max(np.abs(audio_downsampled))
+        peak = np.max(np.abs(audio_downsampled))
+        if peak > 0:
+            audio_downsampled = audio_downsampled / peak
         
-        # Draw waveform
-        prev_y = center_y
-        for x, sample in enumerate(audio_downsampled):
-            y = int(center_y + sample * (h // 4))  # Scale to quarter height
-            
-            # Draw line from previous point
-            cv2.line(frame, (x-1, prev_y), (x, y), colors["primary"], 2)
-            prev_y = y
+        # Draw waveform as one polyline (scaled to quarter height)
+        ys = (center_y + audio_downsampled * (h // 4)).astype(np.int32)
+        xs = np.arange(len(ys), dtype=np.int32)
+        points = np.stack([xs, ys], axis=1).reshape(-1, 1, 2)
+        cv2.polylines(frame, [points], False, colors["primary"], 2)
         
         # Draw center line
         cv2.line(frame, (0, center_y), (w, center_y), colors["secondary"], 1)
     
     def _draw_spectrum(self, frame: np.ndarray, spectrum: np.ndarray, 
                       colors: Dict, frame_idx: int, total_frames: int):
-        """Draw spectrum analyzer"""
+        """Draw spectrum analyzer from normalized (0-1) frequency bins"""
         
         h, w = frame.shape[:2]
         
-        # Use lower frequencies for better visualization
-        spectrum = spectrum[:len(spectrum)//4]  # Use bottom quarter of spectrum
-        
         if len(spectrum) == 0:
             return
         
-        # Normalize
-        if np.max(spectrum) > 0:
-            spectrum = spectrum / np.max(spectrum)
-        
-        # Draw bars
+        # Bar heights, scaled to 80% of frame height
         bar_width = w // len(spectrum)
-        
-        for i, magnitude in enumerate(spectrum):
-            bar_height = int(magnitude * h * 0.8)  # Scale to 80% of frame height
-            x = i * bar_width
-            
-            # Color based on frequency (low = red, high = blue)
-            color_intensity = int(255 * magnitude)
-            color = (
-                min(255, color_intensity),  # Blue
-                min(255, color_intensity // 2),  # Green
-                max(0, 255 - color_intensity)   # Red
-            )
-            
-            cv2.rectangle(frame, (x, h - bar_height), (x + bar_width - 1, h), color, -1)
+        bar_heights = (spectrum * h * 0.8).astype(np.int32)
+        
+        # Color based on frequency (low = red, high = blue), in BGR order
+        intensity = (255 * spectrum).astype(np.int32)
+        bar_colors = np.stack([
+            np.minimum(255, intensity),  # Blue
+            np.minimum(255, intensity // 2),  # Green
+            np.maximum(0, 255 - intensity)   # Red
+        ], axis=1).astype(np.uint8)
+        
+        # Fill every bar at once: expand bars to pixel columns and paint the
+        # rows at or below each column's bar top
+        column_heights = np.repeat(bar_heights, bar_width)
+        column_colors = np.repeat(bar_colors, bar_width, axis=0)
+        mask = np.arange(h)[:, None] >= (h - column_heights)[None, :]
+        np.copyto(frame[:, :len(column_heights)], column_colors[None, :, :],
+                  where=mask[:, :, None])
     
-    def _draw_particles(self, frame: np.ndarray, particles: np.ndarray, 
+    def _draw_particles(self, frame: np.ndarray, particles: Dict[str, np.ndarray], 
                        colors: Dict, energy: float):
         """Draw particle system"""
         
         h, w = frame.shape[:2]
         
-        for particle in particles:
-            x, y, vx, vy, life = particle
-            
+        for x, y, life in zip(particles["x"], particles["y"], particles["life"]):
             if life > 0:
                 # Draw particle
                 radius = max(1, int(life * 10 * energy))
                 color = colors["primary"]
                 cv2.circle(frame, (int(x), int(y)), radius, color, -1)
     
-    def _draw_song_info(self, frame: np.ndarray, song_data: Dict, 
-                       frame_idx: int, total_frames: int):
-        """Draw song information overlay"""
+    def _progress_width(self, frame_idx: int, total_frames: int) -> int:
+        """Filled width in pixels of the song info progress bar"""
         
-        h, w = frame.shape[:2]
+        progress = frame_idx / total_frames if total_frames > 0 else 0
+        return int(self.resolution[0] // 2 * progress)
+    
+    def _song_info_sprites(self, song_data: Dict) -> List[Tuple[int, int, np.ndarray, np.ndarray]]:
+        """Pre-render the static parts of the song info overlay as cropped sprites"""
+        
+        w, h = self.resolution
         
         # Song title (if available)
         title = song_data.get("title", f"{song_data.get('style', 'Generated')} Song")
         
-        # Progress bar
-        progress = frame_idx / total_frames if total_frames > 0 else 0
-        bar_width = w // 2
-        bar_height = 10
-        bar_x = w // 4
-        bar_y = h - 50
+        # Style and tempo info
+        info_text = f"Style: {song_data.get('style', 'Unknown')} | Tempo: {song_data.get('tempo', 120)} BPM | Key: {song_data.get('key', 'C')}"
         
-        # Draw progress bar background
-        cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1)
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        bar_x, bar_y, bar_width, bar_height = self._progress_bar_rect()
+        draws = [
+            # Progress bar background
+            lambda canvas: cv2.rectangle(canvas, (bar_x, bar_y),
+                                         (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1),
+            lambda canvas: cv2.putText(canvas, title, (50, 50), font, 1, (255, 255, 255), 2),
+            lambda canvas: cv2.putText(canvas, info_text, (50, h - 100), font, 0.7, (200, 200, 200), 1),
+        ]
+        
+        # Each element is cropped to its drawn pixels, plus a mask of them
+        sprites = []
+        for draw in draws:
+            canvas = np.zeros((h, w, 3), dtype=np.uint8)
+            draw(canvas)
+            mask = canvas.any(axis=2)
+            ys, xs = np.nonzero(mask)
+            if ys.size == 0:
+                continue
+            y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+            sprites.append((y0, x0, canvas[y0:y1, x0:x1].copy(), mask[y0:y1, x0:x1, None]))
+        return sprites
+    
+    def _progress_bar_rect(self) -> Tuple[int, int, int, int]:
+        """Progress bar position and size as (x, y, width, height)"""
         
-        # Draw progress
-        progress_width = int(bar_width * progress)
-        cv2.rectangle(frame, (bar_x, bar_y), (bar_x + progress_width, bar_y + bar_height), (0, 255, 100), -1)
+        w, h = self.resolution
+        return w // 4, h - 50, w // 2, 10
+    
+    def _draw_song_info(self, frame: np.ndarray, sprites: List[Tuple[int, int, np.ndarray, np.ndarray]], 
+                       frame_idx: int, total_frames: int):
+        """Draw song information overlay"""
         
-        # Draw text
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        cv2.putText(frame, title, (50, 50), font, 1, (255, 255, 255), 2)
+        # Text and progress bar background are blitted from cached sprites
+        for y, x, sprite, mask in sprites:
+            h, w = sprite.shape[:2]
+            np.copyto(frame[y:y + h, x:x + w], sprite, where=mask)
         
-        # Draw style and tempo info
-        info_text = f"Style: {song_data.get('style', 'Unknown')} | Tempo: {song_data.get('tempo', 120)} BPM | Key: {song_data.get('key', 'C')}"
-        cv2.putText(frame, info_text, (50, h - 100), font, 0.7, (200, 200, 200), 1)
+        # Draw progress
+        bar_x, bar_y, bar_width, bar_height = self._progress_bar_rect()
+        progress_width = self._progress_width(frame_idx, total_frames)
+        cv2.rectangle(frame, (bar_x, bar_y), (bar_x + progress_width, bar_y + bar_height), (0, 255, 100), -1)
     
     def _get_style_colors(self, style: str) -> Dict:
         """Get color scheme based on music style"""
@@ -292,75 +550,26 @@ class MP4Exporter:
         
         return color_schemes.get(style, color_schemes["pop"])
     
-    def _init_particles(self, num_particles: int) -> np.ndarray:
-        """Initialize particle system"""
-        
-        # [x, y, vx, vy, life]
-        particles = np.random.rand(num_particles, 5)
-        
-        # Scale positions to screen
-        particles[:, 0] *= self.resolution[0]  # x
-        particles[:, 1] *= self.resolution[1]  # y
-        
-        # Random velocities
-        particles[:, 2] = (np.random.rand(num_particles) - 0.5) * 4  # vx
-        particles[:, 3] = (np.random.rand(num_particles) - 0.5) * 4  # vy
-        
-        # Life
-        particles[:, 4] = np.random.rand(num_particles)
-        
-        return particles
+    def _init_particles(self, num_particles: int,
+                        rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Initialize particle system as one contiguous float32 array per field"""
+        
+        return {
+            # Positions scaled to screen
+            "x": (rng.random(num_particles) * self.resolution[0]).astype(np.float32),
+            "y": (rng.random(num_particles) * self.resolution[1]).astype(np.float32),
+            # Random velocities
+            "vx": ((rng.random(num_particles) - 0.5) * 4).astype(np.float32),
+            "vy": ((rng.random(num_particles) - 0.5) * 4).astype(np.float32),
+            # Life
+            "life": rng.random(num_particles).astype(np.float32),
+        }
     
-    def _update_particles(self, particles: np.ndarray, energy: float) -> np.ndarray:
+    def _update_particles(self, particles: Dict[str, np.ndarray], energy: float,
+                          rng: np.random.Generator) -> Dict[str, np.ndarray]:
         """Update particle positions and properties"""
         
-        # Update positions
-        particles[:, 0] += particles[:, 2] * (1 + energy * 5)  # x += vx
-        particles[:, 1] += particles[:, 3] * (1 + energy * 5)  # y += vy
-        
-        # Update life
-        particles[:, 4] -= 0.01  # Decay life
-        
-        # Reset dead particles
-        dead_mask = particles[:, 4] <= 0
-        particles[dead_mask, 0] = np.random.rand(np.sum(dead_mask)) * self.resolution[0]
-        particles[dead_mask, 1] = np.random.rand(np.sum(dead_mask)) * self.resolution[1]
-        particles[dead_mask, 4] = 1.0  # Reset life
-        
-        # Wrap around screen edges
-        particles[:, 0] = particles[:, 0] % self.resolution[0]
-        particles[:, 1] = particles[:, 1] % self.resolution[1]
-        
-        return particles
-    
-    def _combine_audio_video(self, audio_path: str, video_path: str, output_path: str) -> str:
-        """Combine audio and video using moviepy"""
-        
-        try:
-            # Load video and audio
-            video_clip = VideoFileClip(video_path)
-            audio_clip = AudioFileClip(audio_path)
-            
-            # Set audio to video
-            final_clip = video_clip.set_audio(audio_clip)
-            
-            # Write final video
-            final_clip.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                fps=self.fps,
-                verbose=False,
-                logger=None
-            )
-            
-            # Close clips
-            video_clip.close()
-            audio_clip.close()
-            final_clip.close()
-            
-            return output_path
-            
-        except Exception as e:
-            print(f"❌ Error combining audio/video: {str(e)}")
-            raise
\ No newline at end of file
+        _step_particles(particles["x"], particles["y"], particles["vx"], particles["vy"],
+                        particles["life"], float(energy),
+                        self.resolution[0], self.resolution[1], rng)
+        return particles
\ No newline at end of file
@@ -1,16 +1,56 @@
 # server/audio/processor.py
 import numpy as np
 import soundfile as sf
-from scipy.signal import butter, filtfilt
+from concurrent.futures import ThreadPoolExecutor
+from scipy.signal import butter, sosfilt
 import tempfile
+import hashlib
+import itertools
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import mido
 from mido import MidiFile, MidiTrack, Message
+import numba
+
+# Compiled without the GIL so concurrent renders run on separate cores;
+# hits overlap in the buffer, so the loop itself stays sequential
+@numba.njit(cache=True, nogil=True, fastmath=True)
+def _mix_hits(audio: np.ndarray, sound: np.ndarray, positions: np.ndarray,
+              velocities: np.ndarray) -> None:
+    """Add sound into audio at each position, scaled by its velocity"""
+    n = audio.shape[0]
+    for i in range(positions.shape[0]):
+        start = positions[i]
+        if start >= n:
+            continue
+        end = min(start + sound.shape[0], n)
+        audio[start:end] += sound[:end - start] * velocities[i]
+
+@lru_cache(maxsize=32)
+def _drum_time_base(duration: float, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Time axis and decay envelope shared by every drum hit of one length"""
+    samples = int(duration * sample_rate)
+    t = np.arange(samples, dtype=np.float32) * (1.0 / sample_rate)
+    envelope = np.exp(-5 * t / duration)
+    # Shared between calls, so guard against in-place edits
+    t.flags.writeable = False
+    envelope.flags.writeable = False
+    return t, envelope
+
+@lru_cache(maxsize=32)
+def _highpass(freq: float, sample_rate: int) -> np.ndarray:
+    """4th-order Butterworth high-pass as second-order sections for noise drums"""
+    return butter(4, freq / (sample_rate / 2), btype='high', output='sos')
+
+# Shared by every song render: renders already run in the API's bounded
+# worker threads, so a per-call pool would multiply the thread count
+_section_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                   thread_name_prefix="song-section")
 
 class AudioProcessor:
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         self.sample_rate = 44100
         self.bit_depth = 16
         
@@ -22,14 +62,36 @@ class AudioProcessor:
             "crash": {"freq": 4000, "decay": 1.0, "type": "noise"},
             "ride": {"freq": 3000, "decay": 0.5, "type": "noise"}
         }
+        
+        # Unit-velocity waveform per drum type, synthesized on first use
+        self._drum_cache: Dict[str, np.ndarray] = {}
+        # Root of the per-drum noise generators (reproducible when seeded)
+        self._seed_seq = np.random.SeedSequence(seed)
+        
+        # Distinguishes default filenames stamped at the same clock tick
+        self._file_counter = itertools.count()
     
     def pattern_to_audio(self, pattern: np.ndarray, tempo: int = 120, 
-                        output_dir: str = "./temp") -> str:
+                        output_dir: str = "./temp",
+                        output_filename: Optional[str] = None) -> str:
         """Convert drum pattern to audio file"""
         
         try:
             print(f"🥁 Converting pattern to audio: {pattern.shape}")
             
+            # Name the file after its content so identical requests reuse it
+            pattern = np.asarray(pattern, dtype=np.float64)
+            digest = hashlib.blake2b(
+                pattern.tobytes() + f"{pattern.shape}:{tempo}".encode(),
+                digest_size=16
+            ).hexdigest()
+            filename = output_filename or f"beat_{digest}.wav"
+            output_path = os.path.join(output_dir, filename)
+            # Only a digest name says anything about the file's content
+            if output_filename is None and os.path.exists(output_path):
+                print(f"♻️ Reusing rendered beat: {output_path}")
+                return output_path
+            
             # Calculate timing
             steps_per_beat = 4  # 16th notes
             beats_per_minute = tempo
@@ -42,37 +104,21 @@ class AudioProcessor:
             total_samples = int(total_duration * self.sample_rate)
             
             # Create audio buffer
-            audio = np.zeros(total_samples)
+            audio = np.zeros(total_samples, dtype=np.float32)
             
             # Generate audio for each drum
-            for drum_idx in range(pattern.shape[0]):
-                drum_name = self._get_drum_name(drum_idx)
-                
-                for step_idx in range(num_steps):
-                    velocity = pattern[drum_idx, step_idx]
-                    
-                    if velocity > 0:
-                        # Calculate sample position
-                        sample_pos = int(step_idx * seconds_per_step * self.sample_rate)
-                        
-                        # Generate drum sound
-                        drum_audio = self._generate_drum_sound(drum_name, velocity)
-                        
-                        # Add to main audio buffer
-                        end_pos = min(sample_pos + len(drum_audio), total_samples)
-                        audio_len = end_pos - sample_pos
-                        audio[sample_pos:end_pos] += drum_audio[:audio_len]
+            self._mix_pattern(audio, pattern, seconds_per_step)
             
             # Normalize audio
-            if np.max(np.abs(audio)) > 0:
-                audio = audio / np.max(np.abs(audio)) * 0.8
-            
-            # Save to file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"beat_{timestamp}.wav"
-            output_path = os.path.join(output_dir, filename)
-            
-            sf.write(output_path, audio, self.sample_rate)
+            peak = np.max(np.abs(audio))
+            if peak > 0:
+                audio *= 0.8 / peak
+            
+            # Save to file (write then rename so readers never see a partial file)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=output_dir)
+            os.close(fd)
+            sf.write(tmp_path, audio, self.sample_rate, format="WAV")
+            os.replace(tmp_path, output_path)
             print(f"✅ Beat audio saved: {output_path}")
             
             return output_path
@@ -82,7 +128,8 @@ class AudioProcessor:
             raise
     
     def melody_to_midi(self, melody_data: Dict, tempo: int = 120, 
-                      output_dir: str = "./temp") -> str:
+                      output_dir: str = "./temp",
+                      output_filename: Optional[str] = None) -> str:
         """Convert melody data to MIDI file"""
         
         try:
@@ -118,8 +165,8 @@ class AudioProcessor:
                 current_time += duration
             
             # Save MIDI file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"melody_{timestamp}.mid"
+            timestamp = self._file_stamp()
+            filename = output_filename or f"melody_{timestamp}.mid"
             output_path = os.path.join(output_dir, filename)
             
             mid.save(output_path)
@@ -167,7 +214,7 @@ class AudioProcessor:
             raise
     
     def song_to_audio(self, song_data: Dict, output_dir: str = "./temp", 
-                     suffix: str = "") -> str:
+                     suffix: str = "", output_filename: Optional[str] = None) -> str:
         """Convert complete song data to audio file"""
         
         try:
@@ -182,9 +229,10 @@ class AudioProcessor:
             total_samples = int(total_duration * self.sample_rate)
             
             # Create audio buffer
-            audio = np.zeros(total_samples)
+            audio = np.zeros(total_samples, dtype=np.float32)
             
-            # Process each section
+            # Place each section
+            placements = []
             for section in sections:
                 start_time = section.get("start_time", 0)
                 duration = section.get("duration", 8)
@@ -198,21 +246,28 @@ class AudioProcessor:
                 if start_sample >= total_samples:
                     break
                 
-                # Generate section audio
-                section_audio = self._generate_section_audio(section, duration)
-                
-                # Add to main buffer
+                placements.append((section, duration, start_sample, end_sample))
+            
+            # Generate section audio (mixing and synthesis release the GIL,
+            # so sections render side by side)
+            rendered = _section_pool.map(self._generate_section_audio,
+                                         [section for section, *_ in placements],
+                                         [duration for _, duration, *_ in placements])
+            
+            # Add to main buffer in section order
+            for section_audio, (_, _, start_sample, end_sample) in zip(rendered, placements):
                 section_length = min(len(section_audio), end_sample - start_sample)
                 audio[start_sample:start_sample + section_length] += section_audio[:section_length]
             
             # Normalize
-            if np.max(np.abs(audio)) > 0:
-                audio = audio / np.max(np.abs(audio)) * 0.8
+            peak = np.max(np.abs(audio))
+            if peak > 0:
+                audio *= 0.8 / peak
             
             # Save file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = self._file_stamp()
             title = song_data.get("title", "song").replace(" ", "_")
-            filename = f"{title}_{timestamp}{suffix}.wav"
+            filename = output_filename or f"{title}_{timestamp}{suffix}.wav"
             output_path = os.path.join(output_dir, filename)
             
             sf.write(output_path, audio, self.sample_rate)
@@ -225,7 +280,8 @@ class AudioProcessor:
             raise
     
     def chords_to_audio(self, chords: List[str], tempo: int = 120, 
-                       output_dir: str = "./temp") -> str:
+                       output_dir: str = "./temp",
+                       output_filename: Optional[str] = None) -> str:
         """Convert chord progression to audio"""
         
         try:
@@ -237,16 +293,19 @@ class AudioProcessor:
             total_samples = int(total_duration * self.sample_rate)
             
             # Create audio buffer
-            audio = np.zeros(total_samples)
+            audio = np.zeros(total_samples, dtype=np.float32)
             
-            # Process each chord
+            # Process each chord (progressions repeat, so each distinct chord
+            # is synthesized once)
+            rendered = {}
             for i, chord in enumerate(chords):
                 start_time = i * chord_duration
                 start_sample = int(start_time * self.sample_rate)
-                chord_samples = int(chord_duration * self.sample_rate)
                 
                 # Generate chord audio
-                chord_audio = self._generate_chord_audio(chord, chord_duration)
+                chord_audio = rendered.get(chord)
+                if chord_audio is None:
+                    chord_audio = rendered[chord] = self._generate_chord_audio(chord, chord_duration)
                 
                 # Add to buffer
                 end_sample = min(start_sample + len(chord_audio), total_samples)
@@ -254,12 +313,13 @@ class AudioProcessor:
                 audio[start_sample:end_sample] += chord_audio[:audio_len]
             
             # Normalize
-            if np.max(np.abs(audio)) > 0:
-                audio = audio / np.max(np.abs(audio)) * 0.7
+            peak = np.max(np.abs(audio))
+            if peak > 0:
+                audio *= 0.7 / peak
             
             # Save file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"chords_{timestamp}.wav"
+            timestamp = self._file_stamp()
+            filename = output_filename or f"chords_{timestamp}.wav"
             output_path = os.path.join(output_dir, filename)
             
             sf.write(output_path, audio, self.sample_rate)
@@ -271,6 +331,10 @@ class AudioProcessor:
             print(f"❌ Error converting chords to audio: {str(e)}")
             raise
     
+    def _file_stamp(self) -> str:
+        """Unique stamp for default output filenames"""
+        return f"{time.time_ns()}_{next(self._file_counter)}"
+    
     def _get_drum_name(self, drum_idx: int) -> str:
         """Get drum name from index"""
         drum_names = ["kick", "snare", "hihat", "hihat_open", "crash", 
@@ -295,11 +359,30 @@ class AudioProcessor:
         }
         
         drum_type = drum_map.get(drum_name, "kick")
+        audio = self._drum_cache.get(drum_type)
+        if audio is None:
+            audio = self._drum_cache[drum_type] = self._synthesize_drum(drum_type)
+        
+        # Apply velocity
+        return audio if velocity == 1.0 else audio * np.float32(velocity)
+    
+    def _drum_rng(self, drum_type: str) -> np.random.Generator:
+        """Independent PCG64 stream for one drum type's noise"""
+        # Keyed on the drum type rather than spawned in call order, so the
+        # noise doesn't depend on which section thread synthesizes it first
+        spawn_key = (list(self.drum_samples).index(drum_type),)
+        return np.random.default_rng(
+            np.random.SeedSequence(self._seed_seq.entropy, spawn_key=spawn_key)
+        )
+    
+    def _synthesize_drum(self, drum_type: str) -> np.ndarray:
+        """Synthesize one unit-velocity drum hit"""
+        
         params = self.drum_samples.get(drum_type, self.drum_samples["kick"])
         
         duration = params["decay"]
-        samples = int(duration * self.sample_rate)
-        t = np.linspace(0, duration, samples)
+        t, envelope = _drum_time_base(duration, self.sample_rate)
+        samples = len(t)
         
         if params["type"] == "sine":
             # Generate sine wave (for kick)
@@ -309,80 +392,68 @@ class AudioProcessor:
             audio[:len(click)] += click * 0.5
         else:
             # Generate noise (for snare, hihat, etc.)
-            audio = np.random.normal(0, 1, samples)
-            # Filter for frequency content
-            b, a = butter(4, params["freq"] / (self.sample_rate / 2), btype='high')
-            audio = filtfilt(b, a, audio)
+            audio = self._drum_rng(drum_type).standard_normal(samples)
+            # Filter for frequency content in one causal pass (zero phase
+            # is inaudible on a noise burst)
+            audio = sosfilt(_highpass(params["freq"], self.sample_rate), audio)
         
         # Apply envelope
-        envelope = np.exp(-5 * t / duration)
         audio *= envelope
         
-        # Apply velocity
-        audio *= velocity
-        
-        return audio.astype(np.float32)
+        audio = audio.astype(np.float32, copy=False)
+        # Shared by every later hit, so guard against in-place edits
+        audio.flags.writeable = False
+        return audio
     
     def _midi_to_simple_audio(self, mid: MidiFile, duration: float) -> np.ndarray:
         """Convert MIDI to simple audio using sine waves"""
         
         total_samples = int(duration * self.sample_rate)
-        audio = np.zeros(total_samples)
+        audio = np.zeros(total_samples, dtype=np.float32)
         
-        # Track note events
-        current_time = 0
+        # Collect note events first, grouped by pitch and length, so each
+        # distinct note is rendered once and all its hits mixed in one call
         active_notes = {}
+        hits = {}
+        seconds_per_tick = mido.tick2second(1, mid.ticks_per_beat, 500000)
         
         for track in mid.tracks:
             track_time = 0
             
             for msg in track:
-                track_time += mido.tick2second(msg.time, mid.ticks_per_beat, 500000)
+                track_time += msg.time * seconds_per_tick
                 
                 if msg.type == 'note_on' and msg.velocity > 0:
                     # Start note
                     freq = 440 * (2 ** ((msg.note - 69) / 12))  # A4 = 440Hz
-                    active_notes[msg.note] = {
-                        'freq': freq,
-                        'start_time': track_time,
-                        'velocity': msg.velocity / 127.0
-                    }
+                    active_notes[msg.note] = (freq, track_time, msg.velocity / 127.0)
                     
                 elif msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
                     # End note
                     if msg.note in active_notes:
-                        note_info = active_notes[msg.note]
-                        note_duration = track_time - note_info['start_time']
-                        
-                        # Generate note audio
-                        note_audio = self._generate_note_audio(
-                            note_info['freq'],
-                            note_duration,
-                            note_info['velocity'],
-                            note_info['start_time']
-                        )
-                        
-                        # Add to main audio
-                        start_sample = int(note_info['start_time'] * self.sample_rate)
-                        end_sample = min(start_sample + len(note_audio), total_samples)
-                        
-                        if start_sample < total_samples:
-                            audio_len = end_sample - start_sample
-                            audio[start_sample:end_sample] += note_audio[:audio_len]
-                        
-                        del active_notes[msg.note]
-        
-        return audio.astype(np.float32)
+                        freq, start_time, velocity = active_notes.pop(msg.note)
+                        starts, velocities = hits.setdefault((freq, track_time - start_time), ([], []))
+                        starts.append(int(start_time * self.sample_rate))
+                        velocities.append(velocity)
+        
+        for (freq, note_duration), (starts, velocities) in hits.items():
+            # Render at unit velocity; the mixer scales each hit
+            note_audio = self._generate_note_audio(freq, note_duration, 1.0, 0.0)
+            _mix_hits(audio, note_audio, np.asarray(starts, dtype=np.int64),
+                      np.asarray(velocities, dtype=np.float32))
+        
+        return audio
     
     def _generate_note_audio(self, freq: float, duration: float, 
                            velocity: float, start_time: float) -> np.ndarray:
         """Generate audio for a single note"""
         
         samples = int(duration * self.sample_rate)
-        t = np.linspace(0, duration, samples)
+        t = np.arange(samples, dtype=np.float32) * (1.0 / self.sample_rate)
         
         # Generate sine wave
-        audio = np.sin(2 * np.pi * freq * t) * velocity
+        audio = np.sin(2 * np.pi * freq * t)
+        audio *= velocity
         
         # Apply envelope
         attack_time = min(0.05, duration * 0.1)
@@ -391,84 +462,92 @@ class AudioProcessor:
         attack_samples = int(attack_time * self.sample_rate)
         release_samples = int(release_time * self.sample_rate)
         
-        envelope = np.ones(samples)
-        
-        # Attack
+        # Attack and release ramps are applied in place; the sustain in
+        # between is left as is
         if attack_samples > 0:
-            envelope[:attack_samples] = np.linspace(0, 1, attack_samples)
+            audio[:attack_samples] *= np.linspace(0, 1, attack_samples, dtype=np.float32)
         
-        # Release
         if release_samples > 0:
-            envelope[-release_samples:] = np.linspace(1, 0, release_samples)
-        
-        audio *= envelope
+            audio[-release_samples:] *= np.linspace(1, 0, release_samples, dtype=np.float32)
         
-        return audio.astype(np.float32)
+        return audio.astype(np.float32, copy=False)
     
     def _generate_section_audio(self, section: Dict, duration: float) -> np.ndarray:
         """Generate audio for a song section"""
         
         samples = int(duration * self.sample_rate)
-        audio = np.zeros(samples)
+        audio = np.zeros(samples, dtype=np.float32)
         
         # Generate beat if available
         if "beat_pattern" in section:
-            beat_pattern = np.array(section["beat_pattern"])
+            beat_pattern = np.asarray(section["beat_pattern"], dtype=np.float64)
             beat_audio = self._pattern_to_simple_audio(beat_pattern, duration)
-            audio += beat_audio[:len(audio)] * 0.6
+            beat_audio *= 0.6
+            audio += beat_audio[:len(audio)]
         
         # Generate melody if available
         if "melody" in section:
             melody_audio = self._melody_to_simple_audio(section["melody"], duration)
-            audio += melody_audio[:len(audio)] * 0.4
+            melody_audio *= 0.4
+            audio += melody_audio[:len(audio)]
         
-        return audio.astype(np.float32)
+        return audio
     
     def _pattern_to_simple_audio(self, pattern: np.ndarray, duration: float) -> np.ndarray:
         """Convert pattern to simple audio without saving"""
         
         samples = int(duration * self.sample_rate)
-        audio = np.zeros(samples)
+        audio = np.zeros(samples, dtype=np.float32)
         
         steps_per_beat = 4
         beats_per_second = 2  # Simplified timing
         seconds_per_step = 1 / (beats_per_second * steps_per_beat)
         
-        for drum_idx in range(pattern.shape[0]):
-            drum_name = self._get_drum_name(drum_idx)
-            
-            for step_idx in range(pattern.shape[1]):
-                velocity = pattern[drum_idx, step_idx]
-                
-                if velocity > 0:
-                    sample_pos = int(step_idx * seconds_per_step * self.sample_rate)
-                    
-                    if sample_pos < samples:
-                        drum_audio = self._generate_drum_sound(drum_name, velocity)
-                        end_pos = min(sample_pos + len(drum_audio), samples)
-                        audio_len = end_pos - sample_pos
-                        audio[sample_pos:end_pos] += drum_audio[:audio_len]
+        self._mix_pattern(audio, pattern, seconds_per_step)
         
         return audio
     
+    def _mix_pattern(self, audio: np.ndarray, pattern: np.ndarray,
+                     seconds_per_step: float) -> None:
+        """Mix every hit of a drum pattern into audio"""
+        
+        # Sample offset of every step, shared by all drums
+        step_offsets = (np.arange(pattern.shape[1]) * seconds_per_step * self.sample_rate).astype(np.int64)
+        
+        for drum_idx in range(pattern.shape[0]):
+            steps = np.flatnonzero(pattern[drum_idx] > 0)
+            if steps.size == 0:
+                continue
+            
+            # Synthesize each drum once and scale it per hit
+            drum_audio = self._generate_drum_sound(self._get_drum_name(drum_idx))
+            positions = step_offsets[steps]
+            velocities = pattern[drum_idx, steps].astype(np.float32)
+            _mix_hits(audio, drum_audio, positions, velocities)
+    
     def _melody_to_simple_audio(self, melody: Dict, duration: float) -> np.ndarray:
         """Convert melody to simple audio"""
         
         samples = int(duration * self.sample_rate)
-        audio = np.zeros(samples)
+        audio = np.zeros(samples, dtype=np.float32)
         
         notes = melody.get("notes", [])
         durations = melody.get("durations", [])
         
         current_time = 0
+        rendered = {}
         
         for note, note_duration in zip(notes, durations):
             if current_time >= duration:
                 break
                 
-            # Generate note
+            # Generate note (melodies repeat pitches, so render each pitch and
+            # length once)
             freq = 440 * (2 ** ((note - 69) / 12))
-            note_audio = self._generate_note_audio(freq, note_duration, 0.5, current_time)
+            note_audio = rendered.get((freq, note_duration))
+            if note_audio is None:
+                note_audio = rendered[(freq, note_duration)] = self._generate_note_audio(
+                    freq, note_duration, 0.5, current_time)
             
             # Add to audio
             start_sample = int(current_time * self.sample_rate)
@@ -486,7 +565,7 @@ class AudioProcessor:
         """Generate audio for a chord"""
         
         samples = int(duration * self.sample_rate)
-        t = np.linspace(0, duration, samples)
+        t = np.arange(samples, dtype=np.float32) * (1.0 / self.sample_rate)
         
         # Simple chord mapping (just root + third + fifth)
         chord_intervals = {
@@ -503,18 +582,13 @@ class AudioProcessor:
         base_chord = chord.replace("Maj7", "").replace("7", "").replace("°", "")
         intervals = chord_intervals.get(base_chord, [0, 4, 7])
         
-        # Generate chord tones
-        audio = np.zeros(samples)
+        # Generate all chord tones at once and sum them
         base_freq = 220  # A3
+        freqs = (base_freq * 2.0 ** (np.asarray(intervals) / 12)).astype(np.float32)
+        tones = np.sin(2 * np.pi * freqs[:, None] * t[None, :])
+        audio = tones.sum(axis=0)
         
-        for interval in intervals:
-            freq = base_freq * (2 ** (interval / 12))
-            tone = np.sin(2 * np.pi * freq * t) * 0.3
-            
-            # Apply envelope
-            envelope = np.exp(-2 * t / duration)
-            tone *= envelope
-            
-            audio += tone
+        # Apply envelope (same for every tone) and tone level
+        audio *= np.exp(-2 * t / duration) * 0.3
         
-        return audio.astype(np.float32)
\ No newline at end of file
+        return audio.astype(np.float32, copy=False)
\ No newline at end of file
@@ -4,7 +4,6 @@ import torch
 import torch.nn as nn
 from typing import Dict, List, Optional
 import librosa
-import random
 
 class DrumRNN(nn.Module):
     """RNN model for drum pattern generation"""
@@ -65,10 +64,12 @@ class BeatGenerator:
     
     def generate(self, genre: str = "hip-hop", tempo: int = 120, 
                  bars: int = 4, complexity: float = 0.7,
-                 reference: Optional[Dict] = None) -> np.ndarray:
-        """Generate drum pattern"""
+                 reference: Optional[Dict] = None,
+                 seed: Optional[int] = None) -> np.ndarray:
+        """Generate drum pattern (reproducible when a seed is given)"""
         
         print(f"🥁 Generating beat: Genre={genre}, Tempo={tempo}, Bars={bars}, Complexity={complexity}")
+        rng = np.random.default_rng(seed)
         
         # Use reference data if available
         if reference:
@@ -114,7 +115,7 @@ class BeatGenerator:
             
             # Add variations based on complexity and reference
             if complexity > 0.5:
-                pattern = self._add_variations(pattern, complexity, reference)
+                pattern = self._add_variations(pattern, complexity, reference, rng)
             
             print(f"✅ Generated beat pattern: {pattern.shape}")
             return pattern
@@ -122,12 +123,16 @@ class BeatGenerator:
         else:
             # Use neural network for unknown genres or fallback
             print(f"🤖 Using NN generation for genre: {genre}")
-            return self._generate_with_nn(total_steps, complexity, reference)
+            return self._generate_with_nn(total_steps, complexity, reference, rng)
     
     def _add_variations(self, pattern: np.ndarray, complexity: float, 
-                       reference: Optional[Dict] = None) -> np.ndarray:
+                       reference: Optional[Dict] = None,
+                       rng: Optional[np.random.Generator] = None) -> np.ndarray:
         """Add variations to pattern based on complexity and reference"""
         
+        if rng is None:
+            rng = np.random.default_rng()
+        
         variation_prob = complexity * 0.3
         
         # If we have reference analysis, use it to guide variations
@@ -151,7 +156,7 @@ class BeatGenerator:
         # Add random variations
         for i in range(pattern.shape[0]):
             for j in range(pattern.shape[1]):
-                if np.random.random() < variation_prob * 0.1:
+                if rng.random() < variation_prob * 0.1:
                     # Don't remove kick on strong beats
                     if i == 0 and j % 16 in [0, 8]:  # Kick on beats 1 and 3
                         continue
@@ -167,13 +172,14 @@ class BeatGenerator:
         if complexity > 0.7:
             hihat_idx = 2  # hihat_closed
             for j in range(1, pattern.shape[1], 2):  # Offbeats
-                if np.random.random() < 0.3:
+                if rng.random() < 0.3:
                     pattern[hihat_idx, j] = 0.5  # Ghost note
         
         return pattern
     
     def _generate_with_nn(self, length: int, complexity: float, 
-                         reference: Optional[Dict] = None) -> np.ndarray:
+                         reference: Optional[Dict] = None,
+                         rng: Optional[np.random.Generator] = None) -> np.ndarray:
         """Generate pattern using neural network (fallback method)"""
         
         print("🧠 Using neural network fallback generation")
@@ -214,7 +220,7 @@ class BeatGenerator:
         
         # Add complexity-based variations
         if complexity > 0.5:
-            pattern = self._add_variations(pattern, complexity, reference)
+            pattern = self._add_variations(pattern, complexity, reference, rng)
         
         print(f"✅ NN Generated pattern: {pattern.shape}")
         return pattern
@@ -55,8 +55,11 @@ class MelodyGenerator:
     def generate(self, key: str = "C", scale: str = "major", 
                  tempo: int = 120, bars: int = 4,
                  chord_progression: Optional[List[str]] = None,
-                 reference: Optional[Dict] = None) -> Dict:
-        """Generate melody based on parameters"""
+                 reference: Optional[Dict] = None,
+                 seed: Optional[int] = None) -> Dict:
+        """Generate melody based on parameters (reproducible when a seed is given)"""
+        
+        rng = random.Random(seed)
         
         try:
             print(f"🎵 Generating melody: Key={key}, Scale={scale}, Bars={bars}, Tempo={tempo}")
@@ -77,12 +80,12 @@ class MelodyGenerator:
             print(f"🎼 Scale notes: {extended_scale[:7]}... (total: {len(extended_scale)})")
             
             # Generate rhythm pattern based on reference or default
-            durations = self._generate_durations(bars, reference)
+            durations = self._generate_durations(bars, reference, rng)
             print(f"⏱️  Generated {len(durations)} notes with durations: {durations[:8]}...")
             
             # Generate melody notes
             notes = self._generate_melody_notes(
-                extended_scale, durations, chord_progression, root_midi, reference, key, scale
+                extended_scale, durations, chord_progression, root_midi, reference, key, scale, rng
             )
             
             print(f"🎶 Generated melody with {len(notes)} notes")
@@ -114,9 +117,11 @@ class MelodyGenerator:
                 "total_duration": sum(fallback_durations)
             }
     
-    def _generate_durations(self, bars: int, reference: Optional[Dict] = None) -> List[float]:
+    def _generate_durations(self, bars: int, reference: Optional[Dict] = None,
+                            rng: Optional[random.Random] = None) -> List[float]:
         """Generate rhythm durations for the melody"""
         
+        rng = rng or random.Random()
         beats_per_bar = 4
         total_beats = beats_per_bar * bars
         
@@ -135,7 +140,7 @@ class MelodyGenerator:
         max_attempts = 20
         
         while current_beat < total_beats and attempts < max_attempts:
-            pattern = random.choice(patterns)
+            pattern = rng.choice(patterns)
             
             for duration in pattern:
                 if current_beat + duration <= total_beats:
@@ -159,9 +164,11 @@ class MelodyGenerator:
     
     def _generate_melody_notes(self, scale_notes: List[int], durations: List[float],
                               chord_progression: Optional[List[str]], root: int,
-                              reference: Optional[Dict], key: str, scale: str) -> List[int]:
+                              reference: Optional[Dict], key: str, scale: str,
+                              rng: Optional[random.Random] = None) -> List[int]:
         """Generate melody notes with musical logic"""
         
+        rng = rng or random.Random()
         notes = []
         
         # Ensure we have scale notes
@@ -201,10 +208,10 @@ class MelodyGenerator:
                     
             else:
                 # Regular melodic movement
-                if random.random() < 0.7:  # 70% stepwise motion
-                    current_note = self._stepwise_movement(current_note, scale_notes)
+                if rng.random() < 0.7:  # 70% stepwise motion
+                    current_note = self._stepwise_movement(current_note, scale_notes, rng)
                 else:  # 30% leaps
-                    current_note = self._leap_movement(current_note, scale_notes, root)
+                    current_note = self._leap_movement(current_note, scale_notes, root, rng)
             
             notes.append(current_note)
         
@@ -213,8 +220,10 @@ class MelodyGenerator:
         
         return notes
     
-    def _stepwise_movement(self, current_note: int, scale_notes: List[int]) -> int:
+    def _stepwise_movement(self, current_note: int, scale_notes: List[int],
+                           rng: Optional[random.Random] = None) -> int:
         """Move by step in the scale"""
+        rng = rng or random.Random()
         try:
             current_idx = scale_notes.index(current_note)
         except ValueError:
@@ -229,17 +238,19 @@ class MelodyGenerator:
             direction = -1
         else:
             # Weighted random walk with slight upward bias
-            direction = random.choices([-1, 0, 1], weights=[0.3, 0.2, 0.5])[0]
+            direction = rng.choices([-1, 0, 1], weights=[0.3, 0.2, 0.5])[0]
         
         new_idx = max(0, min(current_idx + direction, len(scale_notes) - 1))
         return scale_notes[new_idx]
     
-    def _leap_movement(self, current_note: int, scale_notes: List[int], root: int) -> int:
+    def _leap_movement(self, current_note: int, scale_notes: List[int], root: int,
+                       rng: Optional[random.Random] = None) -> int:
         """Make a melodic leap"""
+        rng = rng or random.Random()
         # Prefer leaps to chord tones or interesting intervals
         target_intervals = [3, 4, 5, 8]  # Thirds, fourths, fifths, octaves (in semitones)
-        direction = random.choice([-1, 1])
-        interval = random.choice(target_intervals)
+        direction = rng.choice([-1, 1])
+        interval = rng.choice(target_intervals)
         
         target = current_note + (interval * direction)
         
@@ -1,16 +1,18 @@
 # server/models/song_generator.py
 import numpy as np
 from typing import Dict, List, Optional
-import random
 from .beat_generator import BeatGenerator
 from .melody_generator import MelodyGenerator
 from .harmony_suggester import HarmonySuggester
 
 class WholeSongGenerator:
-    def __init__(self):
-        self.beat_gen = BeatGenerator()
-        self.melody_gen = MelodyGenerator()
-        self.harmony_suggest = HarmonySuggester()
+    def __init__(self, beat_gen: Optional[BeatGenerator] = None,
+                 melody_gen: Optional[MelodyGenerator] = None,
+                 harmony_suggest: Optional[HarmonySuggester] = None):
+        # Reuse existing generators when given so models aren't loaded twice
+        self.beat_gen = beat_gen or BeatGenerator()
+        self.melody_gen = melody_gen or MelodyGenerator()
+        self.harmony_suggest = harmony_suggest or HarmonySuggester()
         
         # Song structure templates
         self.song_structures = {
@@ -39,16 +41,18 @@ class WholeSongGenerator:
         }
     
     def generate_whole_song(self, style: str = "pop", tempo: int = 120, 
-                           key: str = "C", total_duration: int = 180) -> Dict:
-        """Generate a complete song structure with all elements"""
+                           key: str = "C", total_duration: int = 180,
+                           seed: Optional[int] = None) -> Dict:
+        """Generate a complete song structure (reproducible when a seed is given)"""
         
         print(f"🎵 Generating whole song: {style} in {key} at {tempo} BPM")
+        rng = np.random.default_rng(seed)
         
         # Get song structure
         structure = self.song_structures.get(style, self.song_structures["pop"])
         
         # Generate chord progression for the song
-        chord_progression = self._generate_song_chords(key, style, len(structure))
+        chord_progression = self._generate_song_chords(key, style, len(structure), rng)
         
         # Generate sections
         sections = []
@@ -62,7 +66,8 @@ class WholeSongGenerator:
                 genre=style,
                 tempo=tempo,
                 bars=config["bars"],
-                complexity=config["complexity"]
+                complexity=config["complexity"],
+                seed=self._child_seed(rng)
             )
             
             # Generate melody for this section
@@ -72,7 +77,8 @@ class WholeSongGenerator:
                 scale="major" if style not in ["jazz"] else "minor",
                 tempo=tempo,
                 bars=config["bars"],
-                chord_progression=section_chords
+                chord_progression=section_chords,
+                seed=self._child_seed(rng)
             )
             
             # Create section
@@ -104,7 +110,8 @@ class WholeSongGenerator:
             "chord_progression": chord_progression
         }
     
-    def _generate_song_chords(self, key: str, style: str, num_sections: int) -> List[List[str]]:
+    def _generate_song_chords(self, key: str, style: str, num_sections: int,
+                              rng: np.random.Generator) -> List[List[str]]:
         """Generate chord progressions for each section"""
         
         # Get base progressions from harmony suggester
@@ -131,13 +138,14 @@ class WholeSongGenerator:
                 prog = base_prog
             else:  # Choruses/other sections
                 # Add tension with secondary dominants
-                prog = self._add_harmonic_tension(base_prog)
+                prog = self._add_harmonic_tension(base_prog, rng)
             
             section_progressions.append(prog)
         
         return section_progressions
     
-    def _add_harmonic_tension(self, base_progression: List[str]) -> List[str]:
+    def _add_harmonic_tension(self, base_progression: List[str],
+                              rng: np.random.Generator) -> List[str]:
         """Add harmonic tension to progression"""
         enhanced = base_progression.copy()
         
@@ -150,14 +158,16 @@ class WholeSongGenerator:
         }
         
         for i, chord in enumerate(enhanced):
-            if chord in substitutions and random.random() < 0.3:
-                enhanced[i] = random.choice(substitutions[chord])
+            if chord in substitutions and rng.random() < 0.3:
+                enhanced[i] = str(rng.choice(substitutions[chord]))
         
         return enhanced
     
-    def generate_arrangement_variations(self, base_song: Dict, num_variations: int = 3) -> List[Dict]:
+    def generate_arrangement_variations(self, base_song: Dict, num_variations: int = 3,
+                                        seed: Optional[int] = None) -> List[Dict]:
         """Generate multiple arrangement variations of the same song"""
         
+        rng = np.random.default_rng(seed)
         variations = []
         base_style = base_song["style"]
         
@@ -188,7 +198,8 @@ class WholeSongGenerator:
                     genre=target_styles[i] if target_styles[i] in ["rock", "jazz", "electronic"] else base_style,
                     tempo=variation["tempo"],
                     bars=section["bars"],
-                    complexity=style_complexity
+                    complexity=style_complexity,
+                    seed=self._child_seed(rng)
                 ).tolist()
                 
                 modified_sections.append(modified_section)
@@ -198,6 +209,10 @@ class WholeSongGenerator:
         
         return variations
     
+    def _child_seed(self, rng: np.random.Generator) -> int:
+        """Draw a seed for one generator call from the song's RNG"""
+        return int(rng.integers(2 ** 32))
+    
     def _get_style_complexity(self, style: str) -> float:
         """Get complexity factor for different styles"""
         complexity_map = {